@@ -0,0 +1,104 @@
+"""
+Benchmark of appending restart data with MetaDataFrame.append_with.
+
+Run as ``python -m benchmark.bench_append_with`` from the repository root.
+
+@author: siddhartha.banerjee
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from tool.data import MetaDataFrame as CFDDataFrame
+
+
+def append_row_by_row(
+        cfd: CFDDataFrame = None,
+        df: pd.DataFrame = None,
+) -> None:
+    """Reference row by row append with .loc enlargement."""
+    for row in df.iterrows():
+        try:
+            cfd.loc[row[0]] = row[1]
+        except ValueError:
+            pass
+
+
+def get_restart_frames(
+        nrow: int = 1000,
+        ncol: int = 16,
+) -> tuple:
+    """Give two frames of a restarted run sharing one crank angle."""
+    crank = np.linspace(-180.0, 540.0, 2 * nrow)
+    values = np.random.default_rng(0).normal(size=(2 * nrow, ncol))
+    columns = ['var' + str(icol) for icol in range(ncol)]
+    first = CFDDataFrame(
+        values[:nrow],
+        columns=columns,
+        index=pd.Index(crank[:nrow], name='Crank'),
+    )
+    second = pd.DataFrame(
+        values[nrow - 1:],
+        columns=columns,
+        index=pd.Index(crank[nrow - 1:], name='Crank'),
+    )
+    return first, second
+
+
+def check_compact(
+        nrow: int = 1000,
+) -> None:
+    """Check appending a float64 or compacted restart to a compacted frame.
+
+    The restart repeats the last crank, so one row is overwritten in place
+    and the others are appended. A compacted restart keeps float32.
+    """
+    for compact_restart in (False, True):
+        first, second = get_restart_frames(nrow=nrow)
+        expected = pd.concat([pd.DataFrame(first.iloc[:-1]), second])
+        first.compact(rtol=1e-3)
+        if compact_restart:
+            second = CFDDataFrame(second)
+            second.compact(rtol=1e-3)
+        first.append_with(second)
+        if compact_restart:
+            assert (first.dtypes == np.float32).all(), "Not float32."
+        np.testing.assert_allclose(
+            first.to_numpy(dtype=float),
+            expected.to_numpy(dtype=float),
+            rtol=1e-3,
+        )
+
+
+def run(
+        row_counts: tuple = (1000, 4000, 16000, 64000, 256000),
+        max_reference_rows: int = 4000,
+) -> pd.DataFrame:
+    """Give append time in seconds for increasing row count."""
+    timing = []
+    for nrow in row_counts:
+        first, second = get_restart_frames(nrow=nrow)
+        tic = time.perf_counter()
+        first.append_with(second)
+        bulk = time.perf_counter() - tic
+        if nrow <= max_reference_rows:
+            first, second = get_restart_frames(nrow=nrow)
+            tic = time.perf_counter()
+            append_row_by_row(first, second)
+            reference = time.perf_counter() - tic
+        else:
+            reference = np.nan
+        timing.append(
+            {
+                'rows': nrow,
+                'append_with [s]': bulk,
+                'row_by_row [s]': reference,
+                'rows/sec': nrow / bulk,
+            }
+        )
+    return pd.DataFrame(timing).set_index('rows')
+
+
+if __name__ == '__main__':
+    check_compact()
+    print(run().to_string())
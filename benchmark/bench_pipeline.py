@@ -0,0 +1,201 @@
+"""
+Benchmark of the load and processing pipeline on a synthetic case.
+
+Run as ``python -m benchmark.bench_pipeline`` from the repository root.
+
+@author: siddhartha.banerjee
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from tool.data import AttrDict as CFDDict
+from post.import_cfd_results import FileNameFmt as filefmt
+from post.import_cfd_results import organize_cfd_results as cfdread
+from post.import_cfd_results import ImportCFDResult
+from post.process import SimpleCase
+from benchmark.synthetic import write_case
+from benchmark.synthetic import write_col_files
+
+CASE_NAME = 'bench_case'
+FILE_CATEGORY = CFDDict(
+    {
+        'region_based': [
+            {'thermo': filefmt('thermo*_region#')},
+            {'mixing': filefmt('mixing*_region#')},
+        ],
+        'flow_based': [
+            {'regions_flow': filefmt('regions_flow*')},
+        ],
+    }
+)
+
+
+def measure(
+        name: str = None,
+        func=None,
+        rows: int = None,
+) -> dict:
+    """Give wall time, rows per second and peak traced memory of func."""
+    tracemalloc.start()
+    tic = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), \
+            contextlib.redirect_stderr(io.StringIO()):
+        func()
+    elapsed = time.perf_counter() - tic
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'benchmark': name,
+        'seconds': elapsed,
+        'rows': rows,
+        'rows/sec': rows / elapsed,
+        'peak MiB': peak / 2 ** 20,
+    }
+
+
+def get_case(
+        proj_dir: str = None,
+) -> SimpleCase:
+    """Give case restricted to the synthetic file categories."""
+    case = SimpleCase(proj_dir=proj_dir, proj_name=CASE_NAME)
+    case.file_category = FILE_CATEGORY
+    return case
+
+
+def run(
+        work_dir: str = None,
+        nrow: int = 100000,
+        nregion: int = 2,
+        nrestart: int = 3,
+        ncell: int = 200000,
+        nsnap: int = 4,
+) -> pd.DataFrame:
+    """Give benchmark results of the pipeline steps."""
+    case_dir = work_dir + os.sep + CASE_NAME
+    nwritten = write_case(
+        case_dir=case_dir,
+        nrow=nrow,
+        nregion=nregion,
+        nrestart=nrestart,
+    )
+    ncol = write_col_files(case_dir=case_dir, ncell=ncell, nsnap=nsnap)
+    results = []
+
+    # Names are unique, so the matches memoized by FileNameFmt are not hit
+    file_names = [
+        name.format(irestart, iregion)
+        for irestart in range(100)
+        for iregion in range(50)
+        for name in (
+            'thermo{0}_region{1}',
+            'mixing{0}_region{1}',
+            'thermo{0}_{1}',
+            'regions_flow{0}_{1}',
+        )
+    ]
+    file_fmt = filefmt('thermo*_region#')
+
+    def match_names():
+        matcher = filefmt('thermo*_region#')
+        for file in file_names:
+            if matcher.is_subdomain_file(file_name=file):
+                matcher.id_subdomain_file(file_name=file)
+
+    results.append(
+        measure('FileNameFmt matching', match_names, file_names.__len__())
+    )
+    thermo_rows = nrow * (nregion + 1)
+    results.append(
+        measure(
+            'organize_cfd_results (thermo)',
+            lambda: cfdread(
+                folder_name=case_dir,
+                file_fmt=file_fmt,
+                sorter='Crank',
+                indexer='Crank',
+            ),
+            thermo_rows,
+        )
+    )
+    case = get_case(proj_dir=work_dir)
+    results.append(
+        measure('Case.load_cfd_data', case.load_cfd_data, nwritten)
+    )
+    other = get_case(proj_dir=work_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        other.load_cfd_data()
+    for data in [other.thermo.all, other.mixing.all] \
+            + other.thermo.region + other.mixing.region:
+        data.index = data.index + 720.0
+    other.regions_flow.index = other.regions_flow.index + 720.0
+    results.append(
+        measure(
+            'Case.append_cfd_data',
+            lambda: case.append_cfd_data(other),
+            nwritten,
+        )
+    )
+    thermo = case.thermo.all.copy()
+    results.append(
+        measure(
+            'Case.__cumulative_sum',
+            lambda: case._Case__cumulative_sum(thermo),
+            thermo.__len__(),
+        )
+    )
+
+    result_3d = ImportCFDResult(proj_dir=work_dir, proj_name=CASE_NAME)
+    results.append(measure('load_cfd3d', result_3d.load_cfd3d, ncol))
+    results.append(
+        measure(
+            'get_processed_scav_3d',
+            result_3d.get_processed_scav_3d,
+            ncol,
+        )
+    )
+    results.append(
+        measure(
+            'get_processed_scav_3d (binned)',
+            lambda: result_3d.get_processed_scav_3d(
+                axial_grid=np.linspace(0.0, 1.0, 101),
+            ),
+            ncol,
+        )
+    )
+    results.append(
+        measure(
+            'get_processed_cyl_flow_3d',
+            result_3d.get_processed_cyl_flow_3d,
+            ncol,
+        )
+    )
+    return pd.DataFrame(results).set_index('benchmark')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--regions', type=int, default=2)
+    parser.add_argument('--restarts', type=int, default=3)
+    parser.add_argument('--cells', type=int, default=200000)
+    parser.add_argument('--snapshots', type=int, default=4)
+    parser.add_argument('--work-dir', type=str, default=None)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp_dir:
+        print(
+            run(
+                work_dir=tmp_dir,
+                nrow=args.rows,
+                nregion=args.regions,
+                nrestart=args.restarts,
+                ncell=args.cells,
+                nsnap=args.snapshots,
+            ).to_string()
+        )
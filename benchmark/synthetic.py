@@ -0,0 +1,178 @@
+"""
+Synthetic CONVERGE case generator for benchmarks.
+
+@author: siddhartha.banerjee
+"""
+
+import os
+import numpy as np
+
+HEADER_FMT = '{:>16s}'
+VALUE_FMT = '%16.7e'
+RELEASE = '# CONVERGE Release 3.0.22/  Jun 11 2021' \
+    '       Run Date:Thu Jul  1 04:23:27 2021\n'
+
+
+def write_out_file(
+        file_name: str = None,
+        values: np.ndarray = None,
+        columns: list = None,
+        units: list = None,
+        subcolumns: list = None,
+) -> None:
+    """Write a CONVERGE formatted time series out file."""
+
+    def header_line(names):
+        return '#' + ''.join(HEADER_FMT.format(name) for name in names) \
+            + '\n'
+
+    with open(file_name, 'w') as fp:
+        fp.write(RELEASE)
+        fp.write(header_line([
+            'column ' + str(icol + 1) if icol == 0 else str(icol + 1)
+            for icol in range(columns.__len__())
+        ]))
+        fp.write(header_line(columns))
+        fp.write(header_line(units))
+        if subcolumns is None:
+            fp.write('#\n')
+        else:
+            fp.write(header_line(subcolumns))
+        np.savetxt(fp, values, fmt=VALUE_FMT, delimiter='')
+
+
+def get_crank(
+        nrow: int = 10000,
+        nrestart: int = 1,
+        start: float = -180.0,
+        end: float = 540.0,
+) -> list:
+    """Give crank angles of every restart, each repeating the last one."""
+    crank = np.linspace(start, end, nrow)
+    bounds = np.linspace(0, nrow, nrestart + 1).astype(int)
+    return [
+        crank[max(bounds[irst] - 1, 0):bounds[irst + 1]]
+        for irst in range(nrestart)
+    ]
+
+
+def get_thermo(
+        crank: np.ndarray = None,
+        ncol: int = 16,
+        seed: int = 0,
+) -> tuple:
+    """Give thermo-like values, names and units with a cumulative column."""
+    rng = np.random.default_rng(seed)
+    values = np.empty([crank.size, ncol + 1])
+    values[:, 0] = crank
+    values[:, 1:] = rng.random([crank.size, ncol])
+    # Cumulative quantity restarting from zero like after a restart
+    values[:, 1] = np.cumsum(values[:, 1])
+    columns = ['Crank', 'Integrated_HR'] + [
+        'Var_' + str(icol) for icol in range(2, ncol + 1)
+    ]
+    units = ['(DEG)', '(J)'] + ['(none)' for _ in range(2, ncol + 1)]
+    return values, columns, units
+
+
+def write_engine_echo(
+        case_dir: str = None,
+        rpm: float = 1600,
+        version: str = '3.0.22',
+) -> None:
+    """Write a minimal engine.echo file."""
+    with open(case_dir + os.sep + 'engine.echo', 'w') as fp:
+        fp.write('version: ' + version + '\n---\n\n')
+        fp.write('bore:                     0.13716\n')
+        fp.write('stroke:                   0.1651\n')
+        fp.write('connecting_rod:           0.263\n')
+        fp.write('rpm:                      ' + str(rpm) + '\n')
+
+
+def write_case(
+        case_dir: str = None,
+        nrow: int = 10000,
+        nregion: int = 2,
+        nrestart: int = 3,
+        ncol: int = 16,
+        categories: tuple = ('thermo', 'mixing'),
+        nflow: int = 2,
+) -> int:
+    """Write a synthetic case with region, restart and regions_flow files.
+
+    Every category gets a domain file and one file per region for every
+    restart, named like thermo2_region1.out. Gives number of rows written.
+    """
+    os.makedirs(case_dir, exist_ok=True)
+    write_engine_echo(case_dir=case_dir)
+    nwritten = 0
+    for irst, crank in enumerate(get_crank(nrow=nrow, nrestart=nrestart)):
+        restart = '' if irst == 0 else str(irst)
+        for icat, category in enumerate(categories):
+            for ireg in [None] + list(range(nregion)):
+                values, columns, units = get_thermo(
+                    crank=crank,
+                    ncol=ncol,
+                    seed=icat * 1000 + irst,
+                )
+                suffix = '' if ireg is None else '_region' + str(ireg)
+                write_out_file(
+                    file_name=case_dir + os.sep + category + restart
+                    + suffix + '.out',
+                    values=values,
+                    columns=columns,
+                    units=units,
+                )
+                nwritten += crank.size
+        if nflow > 0:
+            values, columns, units = get_thermo(
+                crank=crank,
+                ncol=2 * nflow,
+                seed=irst,
+            )
+            columns = ['Crank'] + [
+                name + 'Mass_Flow' for name in ('Rate_', 'Tot_')
+                for _ in range(nflow)
+            ]
+            subcolumns = ['(none)'] + [
+                'Regions_0_to_' + str(iflow + 1)
+                for _ in ('Rate_', 'Tot_') for iflow in range(nflow)
+            ]
+            write_out_file(
+                file_name=case_dir + os.sep + 'regions_flow' + restart
+                + '.out',
+                values=values,
+                columns=columns,
+                units=['(DEG)'] + ['(kg)' for _ in columns[1:]],
+                subcolumns=subcolumns,
+            )
+            nwritten += crank.size
+    return nwritten
+
+
+def write_col_files(
+        case_dir: str = None,
+        ncell: int = 100000,
+        nsnap: int = 4,
+        seed: int = 0,
+) -> int:
+    """Write *.col 3D snapshots in the output folder of the case.
+
+    Gives number of cells written.
+    """
+    folder_name = case_dir + os.sep + 'output'
+    os.makedirs(folder_name, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    columns = ['x', 'y', 'z', 'u', 'v', 'w', 'density', 'volume',
+               'INT', 'CYL', 'EXH']
+    for isnap, crank in enumerate(np.linspace(-120.0, 120.0, nsnap)):
+        values = rng.random([ncell, columns.__len__()])
+        values[:, :2] -= 0.5
+        with open(
+            folder_name + os.sep + 'post' + str(isnap).zfill(5)
+            + '_+' + '{:.5e}'.format(crank) + '.col', 'w'
+        ) as fp:
+            fp.write('{:16.5e}'.format(crank) + '   CRANK\n')
+            fp.write(' '.join(columns) + '\n')
+            np.savetxt(fp, values, fmt='%.7e')
+    return ncell * nsnap
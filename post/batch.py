@@ -0,0 +1,237 @@
+"""
+Tools to load CFD results of many cases of a DOE sweep.
+
+@author: siddhartha.banerjee
+"""
+
+from tool.data import AttrDict as CFDDict
+from tool.data import MetaDataFrame as CFDDataFrame
+from post.process import SimpleCase
+from post.process import FILE_SYSTEMS
+from post.import_cfd_results import get_executor
+from post.metrics import combustion_metrics as combmetrics
+from post.metrics import CYCLE_LENGTH
+from concurrent.futures import as_completed
+import contextlib
+import io
+import os
+import traceback
+import pandas as pd
+from tqdm import tqdm
+
+
+def load_case(
+        case_class=SimpleCase,
+        proj_dir: str = None,
+        proj_name: str = None,
+        load_kwargs: dict = None,
+) -> tuple:
+    """Give loaded data of one case by file category and error if failed.
+
+    Only the data is given back, not the case, so a case loaded in another
+    process is not pickled as a whole.
+    """
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            case = case_class(proj_dir=proj_dir, proj_name=proj_name)
+            case.load_cfd_data(**(load_kwargs or {}))
+        data = {}
+        for file_sys in FILE_SYSTEMS:
+            for out_type in case.file_category.get(file_sys, []):
+                file_key = list(out_type)[0]
+                if hasattr(case, file_key):
+                    data[file_key] = getattr(case, file_key)
+        return data, None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def combine_cases(
+        names: list = None,
+        values: list = None,
+):
+    """Give data of the cases combined with case name as outer index.
+
+    Data frames are concatenated with a (case, crank) index, dicts and
+    region lists are combined by key and position.
+    """
+    values = [
+        (name, value) for name, value in zip(names, values)
+        if value is not None
+    ]
+    if values.__len__() == 0:
+        return None
+    if all(isinstance(value, dict) for _, value in values):
+        keys = []
+        for _, value in values:
+            keys += [key for key in value if key not in keys]
+        return CFDDict(
+            {
+                key: combine_cases(
+                    names=[name for name, _ in values],
+                    values=[value.get(key) for _, value in values],
+                )
+                for key in keys
+            }
+        )
+    if all(isinstance(value, list) for _, value in values):
+        nreg = max(value.__len__() for _, value in values)
+        combined = [
+            combine_cases(
+                names=[name for name, _ in values],
+                values=[
+                    value[ireg] if ireg < value.__len__() else None
+                    for _, value in values
+                ],
+            )
+            for ireg in range(nreg)
+        ]
+        return [value if value is not None else [] for value in combined]
+    frames = [
+        (name, value) for name, value in values
+        if isinstance(value, pd.DataFrame) and value.columns.__len__() != 0
+    ]
+    if frames.__len__() == 0:
+        return None
+    combined = CFDDataFrame(
+        pd.concat(
+            [value for _, value in frames],
+            keys=[name for name, _ in frames],
+            names=['case'],
+            axis=0,
+            sort=False,
+        )
+    )
+    combined._unit = frames[0][1].unit_
+    combined._desc = frames[0][1].desc_
+    return combined
+
+
+class CaseBatch:
+    """Cases of a DOE sweep loaded together."""
+
+    def __init__(
+            self,
+            cases: list = None,
+            case_class=SimpleCase,
+    ):
+        """Instantiate the class.
+
+        cases is a list of (proj_dir, proj_name) pairs, each loaded as an
+        instance of case_class. Cases are named by proj_name, or by their
+        result directory if proj_name is not unique.
+        """
+        self.cases = [tuple(case) for case in cases]
+        self.case_class = case_class
+        proj_names = [proj_name for _, proj_name in self.cases]
+        self.names = [
+            proj_name if proj_names.count(proj_name) == 1
+            else proj_dir + os.sep + proj_name
+            for proj_dir, proj_name in self.cases
+        ]
+        self.failed = CFDDict({})
+        self.file_keys = []
+        self._loaded_data = False
+
+    def load_cfd_data(
+            self,
+            workers: int = None,
+            progress: bool = True,
+            **kwargs,
+    ) -> None:
+        """Load data of all cases, each case in one of the worker processes.
+
+        Keyword arguments are given to load_cfd_data of every case, e.g.
+        categories, columns or crank_range. The data of each file category
+        is set as attribute with a (case, crank) index. A case that fails
+        to load is left out and its traceback is kept in failed by name.
+        """
+        loaded = [None for _ in self.cases]
+        self.failed = CFDDict({})
+        t = tqdm(total=self.cases.__len__(), disable=not progress)
+        if workers is None or workers <= 1:
+            for icase, (proj_dir, proj_name) in enumerate(self.cases):
+                loaded[icase], error = load_case(
+                    case_class=self.case_class,
+                    proj_dir=proj_dir,
+                    proj_name=proj_name,
+                    load_kwargs=kwargs,
+                )
+                if error is not None:
+                    self.failed[self.names[icase]] = error
+                t.update()
+        else:
+            with get_executor(workers=workers, pool='process') as executor:
+                futures = {
+                    executor.submit(
+                        load_case,
+                        self.case_class,
+                        proj_dir,
+                        proj_name,
+                        kwargs,
+                    ): icase
+                    for icase, (proj_dir, proj_name) in enumerate(self.cases)
+                }
+                for future in as_completed(futures):
+                    icase = futures[future]
+                    try:
+                        loaded[icase], error = future.result()
+                    except Exception:
+                        error = traceback.format_exc()
+                    if error is not None:
+                        self.failed[self.names[icase]] = error
+                    t.update()
+        t.close()
+        combined = combine_cases(names=self.names, values=loaded)
+        if combined is None:
+            combined = {}
+        self.file_keys = list(combined)
+        for file_key, value in combined.items():
+            setattr(self, file_key, value)
+        self._loaded_data = True
+
+    def get_case(
+            self,
+            file_key: str = None,
+            name: str = None,
+    ):
+        """Give data of a file category of one case."""
+        assert self._loaded_data, "Data not loaded yet."
+
+        def select(value):
+            if isinstance(value, dict):
+                return CFDDict(
+                    {key: select(item) for key, item in value.items()}
+                )
+            if isinstance(value, list):
+                return [select(item) for item in value]
+            if not isinstance(value, pd.DataFrame) \
+                    or name not in value.index.get_level_values('case'):
+                return []
+            selected = CFDDataFrame(value.xs(name, level='case'))
+            selected._unit = value.unit_
+            selected._desc = value.desc_
+            return selected
+
+        return select(getattr(self, file_key))
+
+    def combustion_metrics(
+            self,
+            cycle_length: float = CYCLE_LENGTH,
+            cycle_start: float = None,
+            fractions: tuple = (10, 50, 90),
+            fields: dict = None,
+    ) -> CFDDataFrame:
+        """Give IMEP, peak pressure and burn angles of all cases at once.
+
+        See combustion_metrics of post.metrics for the arguments.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        assert 'thermo' in self.file_keys, "Load thermo data first."
+        return combmetrics(
+            thermo=self.thermo,
+            cycle_length=cycle_length,
+            cycle_start=cycle_start,
+            fractions=fractions,
+            fields=fields,
+        )
@@ -0,0 +1,140 @@
+"""
+Tools for caching parsed CFD results on disk.
+
+@author: siddhartha.banerjee
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from tool.data import MetaDataFrame as CFDDataFrame
+from tool.data import AttrDict as CFDDict
+from post.import_cfd_results import PARSER_VERSION
+
+CACHE_DIR = '.cfd_cache'
+CACHE_EXT = '.npz'
+
+
+class ResultCache:
+    """Size bounded LRU cache of parsed out files in columnar npz format."""
+
+    def __init__(
+            self,
+            cache_dir: str = None,
+            max_bytes: int = 2 ** 30,
+            version: int = PARSER_VERSION,
+    ):
+        """Instantiate the class."""
+        assert (type(cache_dir) is str), 'cache_dir should be str'
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = version
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(
+            self,
+            file_name: str = None,
+            usecols: list = None,
+    ) -> str:
+        """Give cache key from file path, size, mtime and parser version.
+
+        Data parsed with only some columns is keyed by these columns too.
+        """
+        stat = os.stat(file_name)
+        token = '|'.join(
+            [
+                os.path.abspath(file_name),
+                str(stat.st_size),
+                str(stat.st_mtime_ns),
+                str(self.version),
+            ]
+            + ([] if usecols is None else sorted(usecols))
+        )
+        return hashlib.sha1(token.encode()).hexdigest()
+
+    def _path(
+            self,
+            key: str = None,
+    ) -> str:
+        return self.cache_dir + os.sep + key + CACHE_EXT
+
+    def get(
+            self,
+            file_name: str = None,
+            usecols: list = None,
+    ) -> CFDDataFrame:
+        """Give cached data frame of the file, None if not cached."""
+        cache_file = self._path(self.key(file_name, usecols=usecols))
+        try:
+            with np.load(cache_file, allow_pickle=False) as npz:
+                meta = json.loads(str(npz['meta']))
+                data = {
+                    icol: npz['c' + str(icol)]
+                    for icol in range(meta['columns'].__len__())
+                }
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(cache_file)
+        df = CFDDataFrame(data)
+        if meta['names'] is not None:
+            df.columns = pd.MultiIndex.from_tuples(
+                tuples=[tuple(column) for column in meta['columns']],
+                names=meta['names'],
+            )
+        else:
+            df.columns = meta['columns']
+        df._unit = CFDDict(meta['unit'])
+        df._desc = meta['desc']
+        return df
+
+    def put(
+            self,
+            file_name: str = None,
+            df: CFDDataFrame = None,
+            usecols: list = None,
+    ) -> None:
+        """Store the parsed data frame of the file."""
+        cache_file = self._path(self.key(file_name, usecols=usecols))
+        if isinstance(df.columns, pd.MultiIndex):
+            names = list(df.columns.names)
+        else:
+            names = None
+        meta = {
+            'columns': list(df.columns),
+            'names': names,
+            'unit': dict(df.unit_),
+            'desc': dict(df.desc_),
+        }
+        arrays = {
+            'c' + str(icol): df.iloc[:, icol].to_numpy()
+            for icol in range(df.shape[1])
+        }
+        tmp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'wb') as fp:
+            np.savez(fp, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_file, cache_file)
+
+    def evict(self) -> None:
+        """Remove least recently used entries above the size bound."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_EXT):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_EXT):
+                os.remove(entry.path)
@@ -0,0 +1,197 @@
+"""
+Tools to index and overlay engine cycles of multi-cycle runs.
+
+@author: siddhartha.banerjee
+"""
+
+from tool.data import MetaDataFrame as CFDDataFrame
+from tool.data import InterpolateColumns
+from post.metrics import CYCLE_LENGTH
+import numpy as np
+import pandas as pd
+
+
+class CycleIndex:
+    """Cycle boundaries as row offsets into crank sorted data frames.
+
+    Cycle k covers the cranks in (start + k * length,
+    start + (k + 1) * length], cycle 0 also its first crank, as cycles of
+    combustion_metrics. Offsets are kept by (category, part), so rows of a
+    cycle are a slice of the data frame.
+    """
+
+    def __init__(
+            self,
+            start: float = None,
+            length: float = CYCLE_LENGTH,
+            cyc_freq: float = None,
+    ):
+        """Instantiate the class.
+
+        cyc_freq is the crank revolutions per second, used for the times
+        of the cycles. start defaults to the first crank of all data.
+        """
+        self.start = start
+        self.length = length
+        self.cyc_freq = cyc_freq
+        self.first = np.inf
+        self.end = -np.inf
+        self.cranks = {}
+        self.offsets = {}
+
+    def add(
+            self,
+            file_key: str = None,
+            part: str = 'all',
+            frame: pd.DataFrame = None,
+    ) -> bool:
+        """Add crank of a data frame to index, give if it could be added.
+
+        Only data frames with an increasing numeric crank index are
+        added. Offsets are found by build once all are added.
+        """
+        index = frame.index.get_level_values(-1)
+        if index.__len__() == 0 or not pd.api.types.is_numeric_dtype(index) \
+                or not index.is_monotonic_increasing:
+            self.cranks.pop((file_key, part), None)
+            self.offsets.pop((file_key, part), None)
+            return False
+        crank = index.to_numpy(dtype=float)
+        self.first = min(self.first, crank[0])
+        self.end = max(self.end, crank[-1])
+        self.cranks[(file_key, part)] = crank
+        return True
+
+    def build(
+            self,
+            keys: list = None,
+    ) -> None:
+        """Find offsets of all cycles into every added data frame.
+
+        With keys, only the (category, part) in keys are searched again,
+        e.g. those with appended rows. The others only get the new cycles
+        after their last row, which are empty.
+        """
+        if self.start is None and self.cranks.__len__() != 0:
+            self.start = self.first
+        ncycle = self.__len__()
+        boundaries = self.start + self.length * np.arange(1, ncycle)
+        for key, crank in self.cranks.items():
+            offsets = self.offsets.get(key)
+            if keys is not None and key not in keys \
+                    and offsets is not None and offsets.size <= ncycle + 1:
+                self.offsets[key] = np.append(
+                    offsets,
+                    np.full(ncycle + 1 - offsets.size, crank.size),
+                )
+                continue
+            self.offsets[key] = np.concatenate(
+                [
+                    [0],
+                    np.searchsorted(crank, boundaries, side='right'),
+                    [crank.size],
+                ]
+            )
+
+    def __len__(self) -> int:
+        if self.start is None or self.cranks.__len__() == 0:
+            return 0
+        return max(int(np.ceil((self.end - self.start) / self.length)), 1)
+
+    def get_offsets(
+            self,
+            file_key: str = None,
+            part: str = 'all',
+    ) -> np.ndarray:
+        """Give first row of every cycle and the number of rows."""
+        assert (file_key, part) in self.offsets, \
+            "No cycles of " + file_key + " " + part + "."
+        return self.offsets[(file_key, part)]
+
+    def get_slice(
+            self,
+            file_key: str = None,
+            part: str = 'all',
+            cycle: int = 0,
+    ) -> slice:
+        """Give rows of a cycle as slice."""
+        offsets = self.get_offsets(file_key=file_key, part=part)
+        assert -offsets.size < cycle < offsets.size - 1, \
+            "No cycle " + str(cycle) + "."
+        cycle = cycle % (offsets.size - 1)
+        return slice(offsets[cycle], offsets[cycle + 1])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Give crank and time of start and end, and rows of every cycle.
+
+        Times are from the start of the first cycle, in seconds.
+        """
+        ncycle = self.__len__()
+        crank_start = self.start + self.length * np.arange(ncycle)
+        cycles = pd.DataFrame(
+            {
+                'crank_start': crank_start,
+                'crank_end': crank_start + self.length,
+            },
+            index=pd.RangeIndex(ncycle, name='cycle'),
+        )
+        if self.cyc_freq is not None:
+            cycles['time_start'] = (crank_start - self.start) \
+                / (360.0 * self.cyc_freq)
+            cycles['time_end'] = cycles.time_start \
+                + self.length / (360.0 * self.cyc_freq)
+        for (file_key, part), offsets in self.offsets.items():
+            cycles['rows_' + file_key + '_' + part] = np.diff(offsets)
+        return cycles
+
+    def overlay(
+            self,
+            file_key: str = None,
+            part: str = 'all',
+            frame: pd.DataFrame = None,
+            field_names: list = None,
+            grid: np.ndarray = None,
+    ) -> CFDDataFrame:
+        """Give fields of all cycles on a common crank grid of one cycle.
+
+        Rows are the cranks of grid, default the crank steps of the data
+        over the first cycle, and columns are (field, cycle), so that
+        EnsembleStatistics gives phase averages. All cycles are
+        interpolated at once by one search of the data, which is not
+        copied by cycle. Cranks without data in a cycle give NaN.
+        """
+        offsets = self.get_offsets(file_key=file_key, part=part)
+        crank = self.cranks[(file_key, part)]
+        if field_names is None:
+            field_names = list(frame.columns)
+        ncycle = offsets.size - 1
+        if grid is None:
+            step = np.median(np.diff(crank)) if crank.size > 1 \
+                else self.length
+            grid = self.start + np.arange(0.0, self.length + step / 2, step)
+            grid = grid[grid <= self.start + self.length]
+        grid = np.asarray(grid, dtype=float)
+        phase = grid - self.start
+        cranks = self.start + self.length * np.arange(ncycle)[:, np.newaxis] \
+            + phase
+        values = frame.loc[:, field_names].to_numpy(dtype=float)
+        overlaid = InterpolateColumns(
+            x=crank,
+            values=values,
+            grid=cranks.ravel(),
+            outside=np.nan,
+        ).reshape(ncycle, grid.size, -1)
+        df = CFDDataFrame(
+            overlaid.transpose(1, 2, 0).reshape(grid.size, -1),
+            index=pd.Index(grid, name=frame.index.names[-1]),
+            columns=pd.MultiIndex.from_product(
+                [field_names, list(range(ncycle))],
+                names=['field', 'cycle'],
+            ),
+        )
+        unit = getattr(frame, '_unit', {})
+        df._unit = {
+            field_name: unit[field_name]
+            for field_name in field_names if field_name in unit
+        }
+        return df
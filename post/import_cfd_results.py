@@ -6,17 +6,42 @@ Tools for importing CFD results.
 
 import numpy as np
 import pandas as pd
+import io
+import json
 import os
-from pandas.io.parsers import TextFileReader
+import re
+import shutil
+import time
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from collections import OrderedDict
+from collections.abc import Mapping
 from tqdm import tqdm
 from tool.data import MetaDataFrame as CFDDataFrame
 from tool.data import AttrDict as CFDDict
+from tool.stats import LoadStats
+from tool.stats import NO_STATS
+from tool.stats import TimedCall
 
 LOADCHAR = r'\|/-'
+PARSER_VERSION = 1
+ECHO_CACHE = {}
+ECHO_VALUE_FIRST = re.compile(
+    r'^([-+]?[\d.]+(?:[eE][-+]?\d+)?)\s+([A-Za-z_]\w*)'
+)
+CRANK_SPANS = {}
+COL_STORE_DIR = '.col_store'
+COL_STORE_INDEX = 'index.json'
 
 
 class FileNameFmt:
-    """Helper class to breakdown file name"""
+    """Helper class to breakdown file name
+
+    The format is compiled once into a regex, * being the restart number
+    and # the sub-domain ID, so one match of a file name gives both.
+    """
 
     def __init__(
             self,
@@ -33,32 +58,67 @@ class FileNameFmt:
             self._file_domain_type = file_fmt.split('#')[0].split('*')[-1]
         else:
             self._file_domain_type = None
+        pattern = ''
+        tokens = re.split(r'([*#])', file_fmt.replace('$', ''))
+        for itoken, token in enumerate(tokens):
+            if token == '*':
+                pattern += r'(?P<restart>\d*)'
+            elif token == '#':
+                pattern += r'(?:' + re.escape(tokens[itoken - 1]) \
+                    + r'(?P<domain>\d+))?'
+            elif itoken + 1 < tokens.__len__() and tokens[itoken + 1] == '#':
+                continue
+            else:
+                pattern += re.escape(token)
+        self._regex = re.compile(pattern)
+        self._matched = {}
+
+    def match(
+            self,
+            file_name: str = None,
+    ) -> tuple:
+        """Give (restart, sub-domain ID) of the file, None if not matched.
+
+        Sub-domain ID is None for a file which is not domain specific.
+        """
+        try:
+            return self._matched[file_name]
+        except KeyError:
+            pass
+        found = self._regex.search(file_name.replace('.out', ''))
+        if found is None:
+            matched = None
+        else:
+            domain = found.groupdict().get('domain')
+            matched = (
+                int(found.group('restart') or 0),
+                int(domain) if domain is not None else None,
+            )
+        self._matched[file_name] = matched
+        return matched
 
     def is_subdomain_file(
             self,
             file_name: str = None,
     ) -> bool:
         """Answers is the file a domain specific file?"""
-        file_name = file_name.replace('.out', '')
-        if self._is_file_fmt_has_domain:
-            return self._file_domain_type in file_name
-        else:
-            return False
+        return self.id_subdomain_file(file_name=file_name) is not None
 
     def id_subdomain_file(
             self,
             file_name: str = None,
     ):
         """Sub-domain ID number is returned."""
-        if self.is_subdomain_file(file_name=file_name):
-            iloc = file_name.find(self._file_domain_type) \
-                + len(self._file_domain_type)
-            try:
-                return int(file_name[iloc:].split('_')[0])
-            except ValueError:
-                return int(file_name[iloc:].split('-')[0])
-        else:
-            return None
+        matched = self.match(file_name=file_name)
+        return matched[1] if matched is not None else None
+
+    def id_restart_file(
+            self,
+            file_name: str = None,
+    ) -> int:
+        """Restart number following the category name is returned."""
+        matched = self.match(file_name=file_name)
+        return matched[0] if matched is not None else None
 
     @property
     def file_category(self):
@@ -72,14 +132,159 @@ class FileNameFmt:
             return None
 
 
+class CaseFileIndex:
+    """Index of CFD out files of case folders scanned once."""
+
+    extensions = ('.out',)
+
+    def __init__(
+            self,
+            folder_names: list = None,
+    ):
+        """Instantiate the class."""
+        self._folders = {}
+        self._matched = {}
+        for folder_name in folder_names or []:
+            if folder_name is not None:
+                self.scan(folder_name=folder_name)
+
+    @staticmethod
+    def _key(
+            folder_name: str = None,
+    ) -> str:
+        return os.path.abspath(folder_name)
+
+    def scan(
+            self,
+            folder_name: str = None,
+    ) -> None:
+        """Scan a folder for out files."""
+        entries = []
+        for entry in os.scandir(folder_name):
+            ext = os.path.splitext(entry.name)[1]
+            if ext not in self.extensions or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append(
+                [entry.name, ext, stat.st_size, stat.st_mtime_ns]
+            )
+        self._folders[self._key(folder_name)] = {
+            'mtime_ns': os.stat(folder_name).st_mtime_ns,
+            'entries': entries,
+        }
+        self._matched = {
+            key: value for key, value in self._matched.items()
+            if key[0] != self._key(folder_name)
+        }
+
+    def get_files(
+            self,
+            folder_name: str = None,
+            file_category: str = None,
+    ) -> list:
+        """Give out file names (without .out) containing the category."""
+        folder = self._key(folder_name)
+        if folder not in self._folders:
+            self.scan(folder_name=folder_name)
+        if (folder, file_category) not in self._matched:
+            self._matched[(folder, file_category)] = [
+                name.replace('.out', '')
+                for name, ext, _, _ in self._folders[folder]['entries']
+                if ext == '.out' and file_category in name
+            ]
+        return self._matched[(folder, file_category)]
+
+    def is_stale(self) -> bool:
+        """Answers has any scanned folder changed since the scan?"""
+        for folder, scanned in self._folders.items():
+            try:
+                if os.stat(folder).st_mtime_ns != scanned['mtime_ns']:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def to_frame(
+            self,
+            file_fmts: dict = None,
+    ) -> pd.DataFrame:
+        """Give table of files with matched category, region and restart."""
+        rows = []
+        for folder, scanned in self._folders.items():
+            for name, ext, size, mtime_ns in scanned['entries']:
+                row = {
+                    'folder': folder,
+                    'file': name,
+                    'ext': ext,
+                    'size': size,
+                    'mtime_ns': mtime_ns,
+                    'category': None,
+                    'region': None,
+                    'restart': None,
+                }
+                is_matched = False
+                for file_key, file_fmt in (file_fmts or {}).items():
+                    if ext == '.out' and file_fmt.match(name) is not None:
+                        rows.append(
+                            dict(
+                                row,
+                                category=file_key,
+                                region=file_fmt.id_subdomain_file(
+                                    file_name=name),
+                                restart=file_fmt.id_restart_file(
+                                    file_name=name),
+                            )
+                        )
+                        is_matched = True
+                if not is_matched:
+                    rows.append(row)
+        return pd.DataFrame(rows)
+
+    def save(
+            self,
+            file_name: str = None,
+    ) -> None:
+        """Save the scanned folders to a json file."""
+        with open(file_name, 'w') as fp:
+            json.dump({'folders': self._folders}, fp)
+
+    @classmethod
+    def load(
+            cls,
+            file_name: str = None,
+    ):
+        """Give index saved with save."""
+        index = cls()
+        with open(file_name, 'r') as fp:
+            index._folders = json.load(fp)['folders']
+        return index
+
+
 def organize_cfd_results(
         folder_name: str = None,
         append_folder_name: str = None,
         file_fmt: FileNameFmt = None,
         sorter: str = None,
         indexer: str = None,
+        workers: int = None,
+        pool: str = 'thread',
+        executor: Executor = None,
+        cache=None,
+        tails: dict = None,
+        file_index: CaseFileIndex = None,
+        usecols: list = None,
+        regions: list = None,
+        crank_range: tuple = None,
+        stats: LoadStats = NO_STATS,
 ):
-    """Give dict with CFD data from a given file category of CFD output"""
+    """Give dict with CFD data from a given file category of CFD output
+
+    With usecols, only these columns and the sorter and indexer columns are
+    parsed, and with regions, only the files of these sub-domains are. With
+    crank_range=(start, end), only the rows with sorter column within the
+    range are parsed and the body of files outside of it is not read.
+    Timings of scan, parse, concat, sort and set_index are added to stats.
+    """
     if file_fmt.file_domain_type is not None:
         cfd_dict = CFDDict(
             {
@@ -93,15 +298,54 @@ def organize_cfd_results(
     files_append = []
     num_reg = []
     file_category = file_fmt.file_category
-    for _, _, f in os.walk(folder_name):
-        for file in f:
-            if '.out' in file and file_category in file:
-                files.append(file.replace('.out', ''))
-    if append_folder_name is not None:
-        for _, _, f in os.walk(append_folder_name):
+    if stats.category is None:
+        stats = stats.bind(file_category)
+    start = time.perf_counter()
+    if file_index is not None:
+        files = file_index.get_files(
+            folder_name=folder_name,
+            file_category=file_category,
+        )
+        if append_folder_name is not None:
+            files_append = file_index.get_files(
+                folder_name=append_folder_name,
+                file_category=file_category,
+            )
+    else:
+        for _, _, f in os.walk(folder_name):
             for file in f:
                 if '.out' in file and file_category in file:
-                    files_append.append(file.replace('.out', ''))
+                    files.append(file.replace('.out', ''))
+        if append_folder_name is not None:
+            for _, _, f in os.walk(append_folder_name):
+                for file in f:
+                    if '.out' in file and file_category in file:
+                        files_append.append(file.replace('.out', ''))
+    # Restart chunks in restart order come out already sorted by sorter
+    files = sorted(
+        [f for f in files if file_fmt.match(file_name=f) is not None],
+        key=lambda f: file_fmt.id_restart_file(file_name=f),
+    )
+    files_append = sorted(
+        [f for f in files_append if file_fmt.match(file_name=f) is not None],
+        key=lambda f: file_fmt.id_restart_file(file_name=f),
+    )
+    if regions is not None:
+        files, files_append = (
+            [
+                f for f in file_list
+                if not file_fmt.is_subdomain_file(file_name=f)
+                or file_fmt.id_subdomain_file(file_name=f) in regions
+            ]
+            for file_list in (files, files_append)
+        )
+    if usecols is not None:
+        usecols = sorted(
+            set(usecols).union(
+                key[0] if isinstance(key, tuple) else key
+                for key in (sorter, indexer) if key is not None
+            )
+        )
     for f in files:
         if file_fmt.is_subdomain_file(file_name=f):
             num_reg.append(
@@ -112,92 +356,54 @@ def organize_cfd_results(
         cfd_data_reg = [[] for i in range(max(num_reg) + int(1))]
     except ValueError:
         cfd_data_reg = None
+    jobs = [(folder_name, file) for file in files]
+    if append_folder_name is not None:
+        jobs += [(append_folder_name, file) for file in files_append]
+    crank_column = sorter[0] if isinstance(sorter, tuple) else sorter
+    stats.add(stage='scan', seconds=time.perf_counter() - start)
     print('Loading ' + file_category + ' files: ', end=' ')
-    iload = int(-1)
-    for file in files:
-        iload += int(1)
+    parsed = parse_out_files(
+        cfd_data_files=[
+            folder + os.sep + file + '.out' for folder, file in jobs
+        ],
+        workers=workers,
+        pool=pool,
+        executor=executor,
+        cache=cache,
+        tails=tails,
+        usecols=usecols,
+        crank_range=crank_range,
+        crank_column=crank_column,
+        stats=stats,
+    )
+    for iload, ((folder, file), data) in enumerate(zip(jobs, parsed)):
+        print('\b'
+              + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
+        if data.columns.__len__() == 0:
+            # Followed file without complete header yet
+            continue
         if not file_fmt.is_subdomain_file(file_name=file):
-            file_name = file
-            print('\b'
-                  + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
-            cfd_data.append(
-                __import_cfd_timeseries_result(
-                    folder_name=folder_name,
-                    file_name=file_name,
-                )
-            )
-        elif file_fmt.is_subdomain_file(file_name=file):
-            file_name = file
-            print('\b'
-                  + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
-            reg_num = int(file_fmt.id_subdomain_file(file_name=file))
-            try:
-                cfd_data_reg[reg_num] = pd.concat(
-                    [
-                        cfd_data_reg[reg_num],
-                        __import_cfd_timeseries_result(
-                            folder_name=folder_name,
-                            file_name=file_name,
-                        )
-                    ],
-                    axis=0,
-                    sort=False,
-                )
-            except TypeError:
-                cfd_data_reg[reg_num] = __import_cfd_timeseries_result(
-                    folder_name=folder_name, file_name=file_name)
-                __unit = cfd_data_reg[reg_num].unit_
+            cfd_data.append(data)
         else:
-            continue
-    if append_folder_name is not None:
-        for file in files_append:
-            iload += int(1)
-            if not file_fmt.is_subdomain_file(file_name=file):
-                file_name = file
-                print('\b'
-                      + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
-                cfd_data.append(
-                    __import_cfd_timeseries_result(
-                        folder_name=append_folder_name,
-                        file_name=file_name,
-                    )
-                )
-            elif file_fmt.is_subdomain_file(file_name=file):
-                file_name = file
-                print('\b'
-                      + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
-                reg_num = int(file_fmt.id_subdomain_file(file_name=file))
-                try:
-                    cfd_data_reg[reg_num] = pd.concat(
-                        [
-                            cfd_data_reg[reg_num],
-                            __import_cfd_timeseries_result(
-                                folder_name=append_folder_name,
-                                file_name=file_name,
-                            )
-                        ],
-                        axis=0,
-                        sort=False,
-                    )
-                except TypeError:
-                    cfd_data_reg[reg_num] = __import_cfd_timeseries_result(
-                        folder_name=append_folder_name, file_name=file_name)
-            else:
-                continue
+            reg_num = int(file_fmt.id_subdomain_file(file_name=file))
+            cfd_data_reg[reg_num].append(data)
     try:
-        cfd = pd.concat(
-            [data for data in cfd_data],
-            axis=0,
-            sort=False,
-        )
+        with stats.stage('concat'):
+            cfd = pd.concat(
+                [data for data in cfd_data],
+                axis=0,
+                sort=False,
+            )
     except ValueError:
         cfd = CFDDataFrame([])
     try:
-        cfd = CFDDataFrame(cfd.sort_values(by=sorter))
+        with stats.stage('sort'):
+            cfd = CFDDataFrame(sort_restart_chunks(cfd, sorter=sorter))
     except KeyError:
         pass
     try:
-        cfd = CFDDataFrame(cfd.set_index(keys=indexer))
+        with stats.stage('set_index'):
+            cfd = CFDDataFrame(cfd.set_index(keys=indexer))
     except ValueError:
         pass
     except KeyError:
@@ -209,15 +415,27 @@ def organize_cfd_results(
         pass
 
     for ireg in np.unique(num_reg):
-        try:
-            cfd_data_reg[ireg] = CFDDataFrame(
-                cfd_data_reg[ireg].sort_values(by=sorter)
+        if cfd_data_reg[ireg].__len__() == 0:
+            continue
+        __unit = cfd_data_reg[ireg][0].unit_
+        with stats.stage('concat'):
+            cfd_data_reg[ireg] = pd.concat(
+                cfd_data_reg[ireg],
+                axis=0,
+                sort=False,
             )
+        try:
+            with stats.stage('sort'):
+                cfd_data_reg[ireg] = CFDDataFrame(
+                    sort_restart_chunks(cfd_data_reg[ireg], sorter=sorter)
+                )
         except KeyError:
             pass
         try:
-            cfd_data_reg[ireg] = \
-                CFDDataFrame(cfd_data_reg[ireg].set_index(keys=indexer))
+            with stats.stage('set_index'):
+                cfd_data_reg[ireg] = CFDDataFrame(
+                    cfd_data_reg[ireg].set_index(keys=indexer)
+                )
         except ValueError:
             pass
         try:
@@ -234,6 +452,37 @@ def organize_cfd_results(
         return cfd
 
 
+def is_in_crank_range(
+        cfd_data_file: str = None,
+        crank_range: tuple = None,
+        crank_column: str = 'Crank',
+) -> bool:
+    """Answers may the out file have rows within crank_range?"""
+    span = read_out_span(cfd_data_file, crank_column=crank_column)
+    if span is None:
+        return True
+    return span[0] <= crank_range[1] and span[1] >= crank_range[0]
+
+
+def sort_restart_chunks(
+        cfd: pd.DataFrame = None,
+        sorter: str = None,
+) -> pd.DataFrame:
+    """Give restart chunks concatenated in one pass merged in sorter order.
+
+    Each chunk of a CONVERGE out file is already sorted, so the sort is
+    skipped when the chunks are in order and otherwise a stable sort merges
+    the sorted runs.
+    """
+    try:
+        presorted = cfd[sorter].is_monotonic_increasing
+    except (KeyError, ValueError, TypeError, AttributeError):
+        presorted = False
+    if presorted:
+        return cfd
+    return cfd.sort_values(by=sorter, kind='stable')
+
+
 def import_cfd(
         folder_name: str = None,
         file_category: str = None,
@@ -281,17 +530,10 @@ def import_cfd(
             print('\b'
                   + LOADCHAR[np.mod(iload, len(LOADCHAR))], end='')
             reg_num = int(str.replace(file[1], file_type, ''))
-            try:
-                cfd_data_reg[reg_num] = pd.concat(
-                    [cfd_data_reg[reg_num],
-                     __import_data(
-                         folder_name=folder_name, file_name=file_name)],
-                    axis=0,
-                    sort=False,
-                )
-            except TypeError:
-                cfd_data_reg[reg_num] = __import_data(
+            cfd_data_reg[reg_num].append(
+                __import_data(
                     folder_name=folder_name, file_name=file_name)
+            )
         else:
             continue
 
@@ -301,7 +543,7 @@ def import_cfd(
         sort=False,
     )
     try:
-        cfd = CFDDataFrame(cfd.sort_values(by=sorter))
+        cfd = CFDDataFrame(sort_restart_chunks(cfd, sorter=sorter))
     except KeyError:
         pass
     try:
@@ -312,9 +554,14 @@ def import_cfd(
     cfd._desc = cfd_data[0].desc_
 
     for ireg in np.unique(num_reg):
+        cfd_data_reg[ireg] = pd.concat(
+            cfd_data_reg[ireg],
+            axis=0,
+            sort=False,
+        )
         try:
             cfd_data_reg[ireg] = CFDDataFrame(
-                cfd_data_reg[ireg].sort_values(by=sorter)
+                sort_restart_chunks(cfd_data_reg[ireg], sorter=sorter)
             )
         except KeyError:
             pass
@@ -331,78 +578,91 @@ def import_cfd(
     return cfd_dict
 
 
-def __import_data(
-        folder_name: str = None,
-        file_name: str = None,
-        header: list = [0, 1],
-        skiprows: list = [0, 1, 4],
-) -> CFDDataFrame:
-    """Give panda data frame for the CFD output file."""
-    folder = r'' + folder_name
-    cfd_data_file = folder + os.sep + file_name + '.out'
-    raw_data: TextFileReader = pd.read_csv(
-        filepath_or_buffer=cfd_data_file,
-        header=header,
-        skiprows=skiprows,
-    )
-    columns = str.split(raw_data.columns[0][0][1:])
-    units = str.split(raw_data.columns[0][1][1:])
-    ncol = columns.__len__()
-    nrow = raw_data.values.__len__()
-    values = np.empty([nrow, ncol])
-    for irow, row in enumerate(raw_data.values):
-        for icol, _ in enumerate(columns):
-            values[irow][icol] = np.float(
-                (str.split(row[0], ))[icol]
-            )
-    df = CFDDataFrame([])
-    metadata = {}
-    for icolumn, column in enumerate(columns):
-        df[column] = values[:, icolumn]
-        metadata[column] = units[icolumn]
-    df._unit = CFDDict(metadata)
-    return df
+def read_out_header(
+        cfd_data_file: str = None,
+        header_lines: int = 5,
+) -> tuple:
+    """Give column names, units and sub-header names of an out file."""
+    with open(cfd_data_file, 'r') as fp:
+        head = [fp.readline() for _ in range(header_lines)]
+    return parse_out_header(head)
 
 
-def __import_cfd_timeseries_result(
-        folder_name: str = None,
-        file_name: str = None,
-        skiprows: list = [0, 1],
-        header: list = [0, 1, 2],
-) -> CFDDataFrame:
-    """Give panda data frame for the CFD output file."""
-    folder = r'' + folder_name
-    cfd_data_file = folder + os.sep + file_name + '.out'
-    raw_data: TextFileReader
+def parse_out_header(
+        head: list = None,
+) -> tuple:
+    """Give column names, units and sub-header names from header lines."""
+    columns = str.split(head[2].strip()[1:])
+    units = str.split(head[3].strip()[1:])
+    subcolumns = str.split(head[4].strip()[1:])
+    return columns, units, subcolumns
+
+
+def read_out_body(
+        cfd_data_file: str = None,
+        ncol: int = None,
+        skiprows: int = 5,
+        usecols: list = None,
+) -> np.ndarray:
+    """Give numeric body of an out file as 2D array in a single pass.
+
+    With usecols, only the columns at these positions are converted.
+    """
+    if usecols is None:
+        usecols = range(ncol)
     try:
         raw_data = pd.read_csv(
-            filepath_or_buffer=cfd_data_file,
-            header=header,
-            skiprows=skiprows,
-        )
-    except pd.errors.ParserError:
-        raw_data = pd.read_csv(
-            filepath_or_buffer=cfd_data_file,
-            header=header,
+            cfd_data_file,
+            sep=r'\s+',
+            header=None,
+            names=range(ncol),
+            usecols=usecols,
             skiprows=skiprows,
-            escapechar=',',
+            engine='c',
+            float_precision='round_trip',
         )
-    columns = str.split(raw_data.columns.levels[0].values[0][1:], )
-    subcolumns = str.split(raw_data.columns.levels[2].values[0][1:], )
-    units = str.split(raw_data.columns.levels[1].values[0][1:], )
-    ncol = columns.__len__()
-    nrow = raw_data.values.__len__()
-    values = np.empty([nrow, ncol])
-    for irow, row in enumerate(raw_data.values):
-        for icol, _ in enumerate(columns):
-            try:
-                values[irow][icol] = np.float(
-                    (str.split(row[0], ))[icol]
-                )
-            except (IndexError, ValueError):
-                values[irow][icol] = np.nan
+    except pd.errors.EmptyDataError:
+        return np.empty([0, usecols.__len__()])
+    # Malformed or short rows are NaN, same as the element-wise parser
+    for icol in raw_data.columns:
+        if raw_data[icol].dtype.kind != 'f':
+            raw_data[icol] = pd.to_numeric(raw_data[icol], errors='coerce')
+    return raw_data.to_numpy(dtype=float)
+
+
+def get_out_usecols(
+        columns: list = None,
+        usecols: list = None,
+) -> list:
+    """Give positions of the columns with header in usecols, None for all."""
+    if usecols is None:
+        return None
+    return [icol for icol, column in enumerate(columns) if column in usecols]
+
+
+def select_out_header(
+        header: tuple = None,
+        positions: list = None,
+) -> tuple:
+    """Give column names, units and sub-header names at the positions."""
+    if positions is None:
+        return header
+    return tuple(
+        [names[icol] for icol in positions] if names.__len__() != 0 else names
+        for names in header
+    )
+
+
+def get_out_frame(
+        values: np.ndarray = None,
+        columns: list = None,
+        units: list = None,
+        subcolumns: list = None,
+        subheader: bool = True,
+) -> CFDDataFrame:
+    """Give panda data frame with units from parsed out file data."""
     metadata = {}
-    if subcolumns.__len__() != 0:
+    if subheader and subcolumns.__len__() != 0:
         col_arr = [columns, subcolumns]
         columns_tup = list(zip(*col_arr))
         head_idx = pd.MultiIndex.from_tuples(
@@ -421,6 +681,824 @@ def __import_cfd_timeseries_result(
     return df
 
 
+def read_out_file(
+        cfd_data_file: str = None,
+        subheader: bool = True,
+        usecols: list = None,
+        crank_range: tuple = None,
+        crank_column: str = 'Crank',
+) -> CFDDataFrame:
+    """Give panda data frame for the CFD output file.
+
+    With usecols, only the columns with these header names are parsed, and
+    with crank_range, only the lines with crank_column within the range.
+    The body of a file with crank span outside of the range is not read.
+    """
+    header = read_out_header(cfd_data_file)
+    positions = get_out_usecols(columns=header[0], usecols=usecols)
+    if crank_range is None or crank_column not in header[0]:
+        values = read_out_body(
+            cfd_data_file,
+            ncol=header[0].__len__(),
+            usecols=positions,
+        )
+    elif not is_in_crank_range(
+            cfd_data_file,
+            crank_range=crank_range,
+            crank_column=crank_column,
+    ):
+        values = np.empty(
+            [0, header[0].__len__() if positions is None
+             else positions.__len__()]
+        )
+    else:
+        values = read_out_body(
+            io.BytesIO(
+                read_out_window(
+                    cfd_data_file,
+                    crank_range=crank_range,
+                    icol=header[0].index(crank_column),
+                )
+            ),
+            ncol=header[0].__len__(),
+            skiprows=0,
+            usecols=positions,
+        )
+    columns, units, subcolumns = select_out_header(header, positions)
+    return select_crank_rows(
+        get_out_frame(
+            values=values,
+            columns=columns,
+            units=units,
+            subcolumns=subcolumns,
+            subheader=subheader,
+        ),
+        crank_range=crank_range,
+        crank_column=crank_column,
+    )
+
+
+def find_out_end(
+        fp=None,
+        lo: int = None,
+        hi: int = None,
+        step: int = 4096,
+) -> int:
+    """Give offset after the last complete line between lo and hi.
+
+    Lines after it are partly written, as in an out file of a running case.
+    Give lo if there is no complete line.
+    """
+    while hi > lo:
+        start = max(lo, hi - step)
+        fp.seek(start)
+        newline = fp.read(hi - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        hi = start
+    return lo
+
+
+def find_out_offset(
+        fp=None,
+        is_after=None,
+        icol: int = None,
+        lo: int = None,
+        hi: int = None,
+) -> int:
+    """Give offset of the first line from lo on with is_after its value.
+
+    Lines are sorted by the value in column icol, as in an out file, so
+    the line is found by bisection of the offsets between lo and hi. Lines
+    from hi on are taken as after, so that hi can cap a partly written line.
+    """
+    while lo < hi:
+        mid = (lo + hi) // 2
+        fp.seek(mid - 1)
+        fp.readline()
+        line = fp.readline() if fp.tell() < hi else b''
+        try:
+            after = is_after(float(line.split()[icol]))
+        except (IndexError, ValueError):
+            after = line == b''
+        if after:
+            hi = mid
+        else:
+            lo = mid + 1
+    fp.seek(lo - 1)
+    fp.readline()
+    return fp.tell()
+
+
+def read_out_window(
+        cfd_data_file: str = None,
+        crank_range: tuple = None,
+        icol: int = None,
+        skiprows: int = 5,
+) -> bytes:
+    """Give body lines of an out file with column icol within crank_range."""
+    with open(cfd_data_file, 'rb') as fp:
+        for _ in range(skiprows):
+            fp.readline()
+        body = fp.tell()
+        fp.seek(0, os.SEEK_END)
+        size = find_out_end(fp, lo=body, hi=fp.tell())
+        begin = find_out_offset(
+            fp,
+            is_after=lambda value: value >= crank_range[0],
+            icol=icol,
+            lo=body,
+            hi=size,
+        )
+        end = find_out_offset(
+            fp,
+            is_after=lambda value: value > crank_range[1],
+            icol=icol,
+            lo=begin,
+            hi=size,
+        )
+        fp.seek(begin)
+        return fp.read(end - begin)
+
+
+def read_out_span(
+        cfd_data_file: str = None,
+        crank_column: str = 'Crank',
+        skiprows: int = 5,
+) -> tuple:
+    """Give first and last crank_column value of an out file, None if none.
+
+    Only complete lines are read, so the last line of a file that is still
+    written is skipped if partly written. The span is cached per file and
+    modification.
+    """
+    stat = os.stat(cfd_data_file)
+    key = (os.path.abspath(cfd_data_file), crank_column)
+    try:
+        mtime_ns, size, span = CRANK_SPANS[key]
+        if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+            return span
+    except KeyError:
+        pass
+    span = None
+    columns = read_out_header(cfd_data_file)[0]
+    if crank_column in columns:
+        icol = columns.index(crank_column)
+        with open(cfd_data_file, 'rb') as fp:
+            for _ in range(skiprows):
+                fp.readline()
+            body = fp.tell()
+            end = find_out_end(fp, lo=body, hi=stat.st_size)
+            start = find_out_end(fp, lo=body, hi=max(body, end - 1))
+            fp.seek(body)
+            first = fp.readline()
+            fp.seek(start)
+            last = fp.read(end - start)
+        try:
+            span = (float(first.split()[icol]), float(last.split()[icol]))
+        except (IndexError, ValueError):
+            span = None
+    CRANK_SPANS[key] = (stat.st_mtime_ns, stat.st_size, span)
+    return span
+
+
+def select_crank_rows(
+        df: CFDDataFrame = None,
+        crank_range: tuple = None,
+        crank_column: str = 'Crank',
+) -> CFDDataFrame:
+    """Give rows of the data frame with crank_column within crank_range."""
+    if crank_range is None:
+        return df
+    try:
+        icol = list(df.columns.get_level_values(0)).index(crank_column)
+    except ValueError:
+        return df
+    crank = df.iloc[:, icol].to_numpy()
+    is_in = (crank >= crank_range[0]) & (crank <= crank_range[1])
+    if is_in.all():
+        return df
+    selected = CFDDataFrame(df[is_in])
+    selected._unit = df.unit_
+    selected._desc = df.desc_
+    return selected
+
+
+class OutFileTail:
+    """Incremental reader of an out file that is still being written."""
+
+    def __init__(
+            self,
+            cfd_data_file: str = None,
+            header_lines: int = 5,
+            usecols: list = None,
+    ):
+        """Instantiate the class."""
+        self.cfd_data_file = cfd_data_file
+        self.header_lines = header_lines
+        self.usecols = usecols
+        self.offset = 0
+        self._header = None
+
+    def read(self) -> CFDDataFrame:
+        """Give rows completed since the last read.
+
+        Only the bytes after the remembered offset are read and a partly
+        written last line is left for the next read. The file is read
+        again from the start if it was truncated or replaced.
+        """
+        with open(self.cfd_data_file, 'rb') as fp:
+            fp.seek(0, os.SEEK_END)
+            if fp.tell() < self.offset:
+                self.offset = 0
+                self._header = None
+            fp.seek(self.offset)
+            chunk = fp.read()
+        chunk = chunk[:chunk.rfind(b'\n') + 1]
+        skiprows = 0
+        if self._header is None:
+            head = chunk.split(b'\n', self.header_lines)
+            if head.__len__() <= self.header_lines:
+                return CFDDataFrame([])
+            self._header = parse_out_header(
+                [line.decode() for line in head[:self.header_lines]]
+            )
+            skiprows = self.header_lines
+        positions = get_out_usecols(
+            columns=self._header[0],
+            usecols=self.usecols,
+        )
+        values = read_out_body(
+            io.BytesIO(chunk),
+            ncol=self._header[0].__len__(),
+            skiprows=skiprows,
+            usecols=positions,
+        )
+        columns, units, subcolumns = select_out_header(self._header, positions)
+        self.offset += chunk.__len__()
+        return get_out_frame(
+            values=values,
+            columns=columns,
+            units=units,
+            subcolumns=subcolumns,
+        )
+
+
+def get_executor(
+        workers: int = None,
+        pool: str = 'thread',
+) -> Executor:
+    """Give a thread or process pool executor with given workers."""
+    assert pool in ('thread', 'process'), 'pool should be thread or process'
+    if pool == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def parse_out_files(
+        cfd_data_files: list = None,
+        workers: int = None,
+        pool: str = 'thread',
+        executor: Executor = None,
+        cache=None,
+        tails: dict = None,
+        usecols: list = None,
+        crank_range: tuple = None,
+        crank_column: str = 'Crank',
+        stats: LoadStats = NO_STATS,
+) -> list:
+    """Give parsed out files in the given order, optionally in parallel.
+
+    Files found in the cache are not parsed again and newly parsed files
+    are stored in it. With tails, a dict of OutFileTail by file name that
+    is updated in place, only rows added since the last call are given.
+    With usecols, only the columns with these header names are parsed, and
+    with crank_range, only the rows with crank_column within the range.
+    Files parsed for a crank window are not stored in the cache. Time,
+    bytes and rows of every file are added to stats.
+    """
+    if tails is not None:
+        readers = [
+            tails.setdefault(file, OutFileTail(file, usecols=usecols))
+            for file in cfd_data_files
+        ]
+        offsets = [reader.offset for reader in readers]
+        args = (readers,)
+        function = OutFileTail.read
+        if stats.enabled:
+            args = (repeat(OutFileTail.read),) + args
+            function = TimedCall
+        if executor is not None:
+            parsed = list(executor.map(function, *args))
+        else:
+            parsed = list(map(function, *args))
+        if stats.enabled:
+            for reader, offset, (data, seconds) in zip(
+                    readers, offsets, parsed,
+            ):
+                stats.add(
+                    stage='follow',
+                    seconds=seconds,
+                    file=reader.cfd_data_file,
+                    nbytes=reader.offset - offset,
+                    rows=data.__len__(),
+                )
+            parsed = [data for data, _ in parsed]
+        return [
+            select_crank_rows(data, crank_range, crank_column)
+            for data in parsed
+        ]
+    if cache is None:
+        parsed = [None for _ in cfd_data_files]
+    else:
+        parsed = []
+        for file in cfd_data_files:
+            with stats.stage('cache', file=file):
+                parsed.append(cache.get(file, usecols=usecols))
+        parsed = [
+            select_crank_rows(data, crank_range, crank_column)
+            if data is not None else None
+            for data in parsed
+        ]
+    missing = [ifile for ifile, data in enumerate(parsed) if data is None]
+    to_parse = [cfd_data_files[ifile] for ifile in missing]
+    args = (
+        to_parse,
+        repeat(True),
+        repeat(usecols),
+        repeat(crank_range),
+        repeat(crank_column),
+    )
+    function = read_out_file
+    if stats.enabled:
+        args = (repeat(read_out_file),) + args
+        function = TimedCall
+    if executor is not None:
+        new_data = list(executor.map(function, *args))
+    elif workers is None or workers <= 1 or to_parse.__len__() <= 1:
+        new_data = list(map(function, *args))
+    else:
+        with get_executor(workers=workers, pool=pool) as pool_executor:
+            new_data = list(pool_executor.map(function, *args))
+    if stats.enabled:
+        for file, (data, seconds) in zip(to_parse, new_data):
+            stats.add(
+                stage='parse',
+                seconds=seconds,
+                file=file,
+                nbytes=os.path.getsize(file) if crank_range is None
+                else None,
+                rows=data.__len__(),
+            )
+        new_data = [data for data, _ in new_data]
+    for ifile, data in zip(missing, new_data):
+        parsed[ifile] = data
+        if cache is not None and crank_range is None:
+            cache.put(cfd_data_files[ifile], data, usecols=usecols)
+    if cache is not None and crank_range is None and missing.__len__() != 0:
+        cache.evict()
+    return parsed
+
+
+def __import_data(
+        folder_name: str = None,
+        file_name: str = None,
+) -> CFDDataFrame:
+    """Give panda data frame for the CFD output file."""
+    folder = r'' + folder_name
+    cfd_data_file = folder + os.sep + file_name + '.out'
+    return read_out_file(cfd_data_file, subheader=False)
+
+
+def __import_cfd_timeseries_result(
+        folder_name: str = None,
+        file_name: str = None,
+) -> CFDDataFrame:
+    """Give panda data frame for the CFD output file."""
+    folder = r'' + folder_name
+    cfd_data_file = folder + os.sep + file_name + '.out'
+    return read_out_file(cfd_data_file)
+
+
+def parse_echo_value(
+        value: str = None,
+):
+    """Give echo parameter value as int, float or str."""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value.strip('"\'')
+
+
+def parse_echo_lines(
+        lines=None,
+) -> dict:
+    """Give dict of typed parameters from the lines of an echo file.
+
+    Nested parameters are keyed by their dotted path, e.g.
+    'simulation_control.end_time', and the first of repeated keys is kept.
+    Lines of older echo files without ':' give the value before the key,
+    e.g. '1600.0  rpm', followed by an optional comment.
+    """
+    echo = {}
+    parents = []
+    for line in lines:
+        text = line.rstrip()
+        entry = text.lstrip(' -')
+        if ':' not in entry:
+            match = ECHO_VALUE_FIRST.match(entry)
+            if match is not None:
+                echo.setdefault(
+                    match.group(2),
+                    parse_echo_value(match.group(1)),
+                )
+            continue
+        indent = text.__len__() - entry.__len__()
+        name, _, value = entry.partition(':')
+        while parents.__len__() > 0 and parents[-1][0] >= indent:
+            parents.pop()
+        name = name.strip()
+        value = value.strip()
+        if value == '':
+            parents.append((indent, name))
+            continue
+        key = '.'.join([parent for _, parent in parents] + [name])
+        echo.setdefault(key, parse_echo_value(value))
+    return echo
+
+
+def read_echo_file(
+        echo_file: str = None,
+) -> CFDDict:
+    """Give typed parameters of an echo file, parsed once per modification."""
+    stat = os.stat(echo_file)
+    key = os.path.abspath(echo_file)
+    try:
+        mtime_ns, size, echo = ECHO_CACHE[key]
+        if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+            return CFDDict(echo)
+    except KeyError:
+        pass
+    with open(echo_file, 'r') as fp:
+        echo = parse_echo_lines(fp)
+    ECHO_CACHE[key] = (stat.st_mtime_ns, stat.st_size, echo)
+    return CFDDict(echo)
+
+
+def get_col_files(
+        folder_name: str = None,
+) -> list:
+    """Give names of *.col files of 3D CFD results in a folder."""
+    return [
+        entry.name for entry in os.scandir(folder_name)
+        if entry.is_file() and entry.name[-4:] == '.col'
+    ]
+
+
+def read_col_file(
+        col_file: str = None,
+        usecols: list = None,
+        dtype=None,
+) -> tuple:
+    """Give crank time and data frame of a *.col file in a single pass."""
+    with open(col_file, 'r') as colfile:
+        crank_time = colfile.readline().split()[0]
+        data = pd.read_csv(
+            colfile,
+            header=0,
+            sep=r'\s+',
+            usecols=usecols,
+            dtype=dtype,
+            engine='c',
+        )
+    return crank_time, data
+
+
+def read_col_store_index(
+        store_dir: str = None,
+) -> dict:
+    """Give index of a *.col store, empty if there is none."""
+    try:
+        with open(store_dir + os.sep + COL_STORE_INDEX, 'r') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_col_store(
+        folder_name: str = None,
+        store_dir: str = None,
+        dtype=None,
+        workers: int = None,
+        pool: str = 'thread',
+) -> str:
+    """Convert *.col files of a folder to a store of binary arrays.
+
+    Every column of every snapshot is saved as an npy array, to be memory
+    mapped by ColStore, and the index keeps the crank time, columns and
+    rows of each snapshot. Snapshots of unchanged files are not converted
+    again. Give the store directory, by default inside the folder.
+    """
+    if store_dir is None:
+        store_dir = folder_name + os.sep + COL_STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    dtype_name = None if dtype is None else np.dtype(dtype).name
+    index = read_col_store_index(store_dir)
+    if index.get('dtype') != dtype_name:
+        index = {}
+    stored = {
+        snapshot['file']: (crank_time, snapshot)
+        for crank_time, snapshot in index.get('snapshots', {}).items()
+    }
+    snapshots = {}
+    to_convert = []
+    for file in sorted(get_col_files(folder_name=folder_name)):
+        stat = os.stat(folder_name + os.sep + file)
+        crank_time, snapshot = stored.pop(file, (None, None))
+        if snapshot is not None \
+                and snapshot['size'] == stat.st_size \
+                and snapshot['mtime_ns'] == stat.st_mtime_ns:
+            snapshots[crank_time] = snapshot
+        else:
+            to_convert.append((file, stat))
+    for _, snapshot in stored.values():
+        shutil.rmtree(
+            store_dir + os.sep + snapshot['file'][:-4],
+            ignore_errors=True,
+        )
+    col_files = [folder_name + os.sep + file for file, _ in to_convert]
+    if workers is None or workers <= 1:
+        parsed = map(read_col_file, col_files, repeat(None), repeat(dtype))
+        converted = [
+            write_col_snapshot(store_dir, file, stat, *data)
+            for (file, stat), data in zip(to_convert, parsed)
+        ]
+    else:
+        with get_executor(workers=workers, pool=pool) as executor:
+            parsed = executor.map(
+                read_col_file, col_files, repeat(None), repeat(dtype),
+            )
+            converted = [
+                write_col_snapshot(store_dir, file, stat, *data)
+                for (file, stat), data in zip(to_convert, parsed)
+            ]
+    snapshots.update(converted)
+    tmp_index = store_dir + os.sep + COL_STORE_INDEX + '.tmp'
+    with open(tmp_index, 'w') as fp:
+        json.dump({'dtype': dtype_name, 'snapshots': snapshots}, fp)
+    os.replace(tmp_index, store_dir + os.sep + COL_STORE_INDEX)
+    return store_dir
+
+
+def write_col_snapshot(
+        store_dir: str = None,
+        file: str = None,
+        stat: os.stat_result = None,
+        crank_time: str = None,
+        data: pd.DataFrame = None,
+) -> tuple:
+    """Save columns of a *.col snapshot and give its crank time and entry."""
+    snapshot_dir = store_dir + os.sep + file[:-4]
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.makedirs(snapshot_dir)
+    for icol, column in enumerate(data.columns):
+        values = data[column]
+        if values.dtype.kind not in 'biuf':
+            values = pd.to_numeric(values, errors='coerce')
+        np.save(
+            snapshot_dir + os.sep + 'c' + str(icol) + '.npy',
+            np.ascontiguousarray(values.to_numpy()),
+        )
+    return crank_time, {
+        'file': file,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'columns': [str(column) for column in data.columns],
+        'rows': data.__len__(),
+    }
+
+
+def get_cyl_flow(
+        x: np.ndarray = None,
+        y: np.ndarray = None,
+        u: np.ndarray = None,
+        v: np.ndarray = None,
+        out: np.ndarray = None,
+        dtype=np.float64,
+) -> np.ndarray:
+    """Give r, theta, V_r and V_theta of in-cylinder flow as 4 x n array.
+
+    The radius is computed once and the direction cosines are shared by
+    both velocity components. Results are written to out when given.
+    """
+    x, y, u, v = (np.asarray(a, dtype=dtype) for a in (x, y, u, v))
+    if out is None:
+        out = np.empty([4, x.size], dtype=dtype)
+    r, theta, v_r, v_theta = out
+    np.hypot(x, y, out=r)
+    np.arctan2(y, x, out=theta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos = np.divide(x, r)
+        sin = np.divide(y, r)
+    np.multiply(u, cos, out=v_r)
+    v_r += np.multiply(v, sin, out=v_theta)
+    np.multiply(v, cos, out=v_theta)
+    v_theta -= np.multiply(u, sin, out=sin)
+    return out
+
+
+def get_scav_profile(
+        axis: np.ndarray = None,
+        mass: np.ndarray = None,
+        scalars: np.ndarray = None,
+        axial_grid: np.ndarray = None,
+) -> np.ndarray:
+    """Give mass weighted cumulative scalar profiles along the axis.
+
+    scalars is k x n for n cells. Without axial_grid, cells must be sorted
+    along the axis and an n x k profile is given. With axial_grid, cells
+    are binned with bincount and the grid size x k profile is over cells
+    up to each grid point.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if axial_grid is None:
+            return (
+                np.cumsum(scalars * mass, axis=1, dtype=float)
+                / np.cumsum(mass)
+            ).T
+        nbin = axial_grid.__len__()
+        ibin = np.searchsorted(axial_grid, axis, side='left')
+        mass_bin = np.bincount(ibin, weights=mass, minlength=nbin + 1)
+        scalar_bin = np.stack(
+            [
+                np.bincount(ibin, weights=scalar * mass, minlength=nbin + 1)
+                for scalar in scalars
+            ],
+            axis=1,
+        )
+        return (
+            np.cumsum(scalar_bin[:nbin], axis=0)
+            / np.cumsum(mass_bin[:nbin])[:, np.newaxis]
+        )
+
+
+class LazyColData(Mapping):
+    """Read-only dict of *.col data by crank time parsed on first access.
+
+    Parsed snapshots are kept in a least recently used cache bounded by
+    number of entries and optionally by bytes. Transforms added with
+    add_transform are applied to every snapshot when it is parsed.
+    """
+
+    def __init__(
+            self,
+            col_files: list = None,
+            usecols: list = None,
+            dtype=None,
+            max_cached: int = 8,
+            max_bytes: int = None,
+    ):
+        """Instantiate the class."""
+        self._files = OrderedDict()
+        for col_file in col_files:
+            with open(col_file, 'r') as colfile:
+                self._files[colfile.readline().split()[0]] = col_file
+        self.usecols = usecols
+        self.dtype = dtype
+        self.max_cached = max_cached
+        self.max_bytes = max_bytes
+        self._cached = OrderedDict()
+        self._cached_bytes = {}
+        self._transforms = []
+
+    def __getitem__(
+            self,
+            crank_time: str = None,
+    ) -> pd.DataFrame:
+        if crank_time in self._cached:
+            self._cached.move_to_end(crank_time)
+            return self._cached[crank_time]
+        data = self._read(crank_time)
+        for transform in self._transforms:
+            transform(data)
+        self._cached[crank_time] = data
+        self._cached_bytes[crank_time] = self._nbytes(crank_time, data)
+        self._evict()
+        return data
+
+    def _read(
+            self,
+            crank_time: str = None,
+    ) -> pd.DataFrame:
+        """Give parsed snapshot at the crank time."""
+        _, data = read_col_file(
+            col_file=self._files[crank_time],
+            usecols=self.usecols,
+            dtype=self.dtype,
+        )
+        return data
+
+    def _nbytes(
+            self,
+            crank_time: str = None,
+            data: pd.DataFrame = None,
+    ) -> int:
+        """Give bytes of a snapshot kept in memory."""
+        return int(data.memory_usage().sum())
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return self._files.__len__()
+
+    def _evict(self) -> None:
+        """Drop least recently used snapshots above the bounds."""
+        while self._cached.__len__() > 1 and (
+                self._cached.__len__() > self.max_cached
+                or (self.max_bytes is not None
+                    and self.cached_bytes > self.max_bytes)):
+            crank_time, _ = self._cached.popitem(last=False)
+            del self._cached_bytes[crank_time]
+
+    def add_transform(
+            self,
+            transform=None,
+    ) -> None:
+        """Apply in place transform to cached and to be parsed snapshots."""
+        for crank_time, data in self._cached.items():
+            transform(data)
+            self._cached_bytes[crank_time] = self._nbytes(crank_time, data)
+        self._transforms.append(transform)
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(self._cached_bytes.values())
+
+
+class ColStore(LazyColData):
+    """Read-only dict of *.col data by crank time from a store.
+
+    Snapshots of a store written by write_col_store are opened as data
+    frames of memory mapped columns, so a column is only read from disk
+    when it is used. Changes to the data are kept in memory.
+    """
+
+    def __init__(
+            self,
+            store_dir: str = None,
+            usecols: list = None,
+            max_cached: int = 8,
+            max_bytes: int = None,
+    ):
+        """Instantiate the class."""
+        super().__init__(
+            col_files=[],
+            usecols=usecols,
+            max_cached=max_cached,
+            max_bytes=max_bytes,
+        )
+        self.store_dir = store_dir
+        snapshots = read_col_store_index(store_dir).get('snapshots', {})
+        for crank_time in sorted(snapshots, key=float):
+            self._files[crank_time] = snapshots[crank_time]
+
+    def _read(
+            self,
+            crank_time: str = None,
+    ) -> pd.DataFrame:
+        """Give snapshot at the crank time with memory mapped columns."""
+        snapshot = self._files[crank_time]
+        snapshot_dir = self.store_dir + os.sep + snapshot['file'][:-4]
+        return pd.DataFrame(
+            {
+                column: np.load(
+                    snapshot_dir + os.sep + 'c' + str(icol) + '.npy',
+                    mmap_mode='c',
+                )
+                for icol, column in enumerate(snapshot['columns'])
+                if self.usecols is None or column in self.usecols
+            },
+            copy=False,
+        )
+
+    def _nbytes(
+            self,
+            crank_time: str = None,
+            data: pd.DataFrame = None,
+    ) -> int:
+        """Give bytes of the columns of a snapshot not memory mapped."""
+        stored = self._files[crank_time]['columns']
+        return int(
+            sum(
+                data[column].memory_usage(index=False)
+                for column in data.columns if column not in stored
+            )
+        )
+
+
 class ImportCFDResult:
     """Class to import CFD results."""
 
@@ -435,6 +1513,7 @@ class ImportCFDResult:
         self.data_timeseries = None
         self.data_3d = {}
         self.processed_scav_3d = {}
+        self.processed_scav_profile = None
         self._loaded_timeseries = False
         self._loaded_3d = False
         self._got_processed_3d_scav = False
@@ -464,35 +1543,95 @@ class ImportCFDResult:
     def load_cfd3d(
         self,
         parsing_function=pd,
+        usecols: list = None,
+        dtype=None,
+        workers: int = None,
+        pool: str = 'thread',
+        lazy: bool = False,
+        max_cached: int = 8,
+        max_bytes: int = None,
+        store: bool = False,
+        store_dir: str = None,
     ) -> None:
-        """Import *.col files from 3D CFD results."""
+        """Import *.col files from 3D CFD results.
+
+        Only usecols are parsed when given, dtype (e.g. np.float32) is used
+        for all of them and files are parsed in parallel with workers. With
+        lazy, files are only indexed and data_3d parses each snapshot on
+        first access, keeping at most max_cached (or max_bytes) in memory.
+        With store, new or changed files are converted once to a binary
+        store (see write_col_store) and data_3d gives snapshots with memory
+        mapped columns, read from disk only when used.
+        """
         folder_name = \
             self.proj_dir + os.sep \
             + self.proj_name + os.sep + \
             'output'
-        all_files = [
-            f for f in os.listdir(
-                folder_name
-            ) if os.path.isfile(
-                os.path.join(folder_name, f)
+        if store:
+            self.data_3d = ColStore(
+                store_dir=write_col_store(
+                    folder_name=folder_name,
+                    store_dir=store_dir,
+                    dtype=dtype,
+                    workers=workers,
+                    pool=pool,
+                ),
+                usecols=usecols,
+                max_cached=max_cached,
+                max_bytes=max_bytes,
             )
-        ]
+            self._loaded_3d = True
+            return
         col_files = [
-            file for file in all_files if '.col' in file[-4:]
+            folder_name + os.sep + file
+            for file in get_col_files(folder_name=folder_name)
         ]
+        if lazy:
+            self.data_3d = LazyColData(
+                col_files=col_files,
+                usecols=usecols,
+                dtype=dtype,
+                max_cached=max_cached,
+                max_bytes=max_bytes,
+            )
+            self._loaded_3d = True
+            return
+        # A lazy or stored data_3d before is a read only mapping
+        self.data_3d = {}
         t = tqdm(total=len(col_files))
-        for file in col_files:
-            file_name = folder_name + os.sep + file
-            with open(file_name, "r") as colfile:
-                crank_time = colfile.readline().split()[0]
+        if parsing_function is not pd:
+            for file_name in col_files:
+                with open(file_name, "r") as colfile:
+                    crank_time = colfile.readline().split()[0]
                 self.data_3d[crank_time] = \
                     parsing_function.read_csv(
                         filepath_or_buffer=file_name,
                         header=[0],
                         skiprows=[0],
-                        delim_whitespace=True,
+                        sep=r'\s+',
+                        usecols=usecols,
+                        dtype=dtype,
+                )
+                t.update()
+        elif workers is None or workers <= 1:
+            for file_name in col_files:
+                crank_time, data = read_col_file(
+                    col_file=file_name,
+                    usecols=usecols,
+                    dtype=dtype,
                 )
+                self.data_3d[crank_time] = data
                 t.update()
+        else:
+            with get_executor(workers=workers, pool=pool) as executor:
+                for crank_time, data in executor.map(
+                        read_col_file,
+                        col_files,
+                        repeat(usecols),
+                        repeat(dtype),
+                ):
+                    self.data_3d[crank_time] = data
+                    t.update()
         t.close()
         self._loaded_3d = True
 
@@ -504,29 +1643,67 @@ class ImportCFDResult:
         intake_scalar: str = 'INT',
         residual_scalar: str = 'CYL',
         exhaust_scalar: str = 'EXH',
+        axial_grid: np.ndarray = None,
     ) -> None:
-        """Get the scavenging front analyzed."""
+        """Get the scavenging front analyzed.
+
+        Without axial_grid, processed_scav_3d gets per-cell profiles of
+        every snapshot, a sorted copy of the cells of each, so memory grows
+        with the number of snapshots even if data_3d is lazy. With it,
+        processed_scav_profile gets the profiles at the grid points of all
+        snapshots as a crank x grid x scalar array, the only memory kept per
+        snapshot.
+        """
         assert self._loaded_3d, "3D data not loaded yet."
         cumulative_sum = {
             'cumINT': intake_scalar,
             'cumCYL': residual_scalar,
             'cumEXH': exhaust_scalar,
         }
-        for key, value in self.data_3d.items():
-            self.processed_scav_3d[key] = value[
-                [cyl_axis, density, volume, intake_scalar,
-                    residual_scalar, exhaust_scalar]
-            ].sort_values(
-                by=cyl_axis, ascending=True)
-            for k, v in cumulative_sum.items():
-                self.processed_scav_3d[key][k] = (
-                    self.processed_scav_3d[key][v] *
-                    self.processed_scav_3d[key][density] *
-                    self.processed_scav_3d[key][volume]
-                ).cumsum(axis=0) / (
-                    self.processed_scav_3d[key][density] *
-                    self.processed_scav_3d[key][volume]
-                ).cumsum(axis=0)
+        scalars = list(cumulative_sum.values())
+        if axial_grid is None:
+            for key, value in self.data_3d.items():
+                data = value[
+                    [cyl_axis, density, volume] + scalars
+                ].sort_values(
+                    by=cyl_axis, ascending=True)
+                data[list(cumulative_sum)] = get_scav_profile(
+                    axis=data[cyl_axis].to_numpy(),
+                    mass=np.multiply(
+                        data[density].to_numpy(),
+                        data[volume].to_numpy(),
+                        dtype=float,
+                    ),
+                    scalars=data[scalars].to_numpy().T,
+                )
+                self.processed_scav_3d[key] = data
+        else:
+            axial_grid = np.asarray(axial_grid, dtype=float)
+            crank = []
+            profile = []
+            for key, value in self.data_3d.items():
+                crank.append(float(key))
+                profile.append(
+                    get_scav_profile(
+                        axis=value[cyl_axis].to_numpy(),
+                        mass=np.multiply(
+                            value[density].to_numpy(),
+                            value[volume].to_numpy(),
+                            dtype=float,
+                        ),
+                        scalars=value[scalars].to_numpy().T,
+                        axial_grid=axial_grid,
+                    )
+                )
+            order = np.argsort(crank, kind='stable')
+            self.processed_scav_profile = CFDDict(
+                {
+                    'crank': np.array(crank)[order],
+                    'axial': axial_grid,
+                    'scalar': list(cumulative_sum),
+                    'profile': np.stack(profile)[order],
+                }
+            )
         self._got_processed_3d_scav = True
 
     def get_processed_cyl_flow_3d(
@@ -535,37 +1712,40 @@ class ImportCFDResult:
         cyl_y: str = 'y',
         cyl_u: str = 'u',
         cyl_v: str = 'v',
+        dtype=np.float64,
+        workers: int = None,
     ) -> tuple:
-        """Get in-cylinder flow analysis using 3d CFD data."""
+        """Get in-cylinder flow analysis using 3d CFD data.
+
+        Snapshots are processed in a thread pool with workers.
+        """
         assert self._loaded_3d, "3d data not loaded yet."
 
-        def transform(x, y, u, v): return (
-            np.sqrt(x ** 2.0 + y ** 2.0),
-            np.arctan2(y, x),
-            u * x / np.sqrt(
-                x ** 2 + y ** 2
-            ) + v * y / np.sqrt(
-                x ** 2 + y ** 2
-            ),
-            - u * y / np.sqrt(
-                x ** 2 + y ** 2
-            ) + v * x / np.sqrt(
-                x ** 2 + y ** 2
-            ),
-        )
-        t = tqdm(total=self.data_3d.__len__())
-        for data3d in self.data_3d.values():
+        def add_cyl_flow(data3d):
             data3d['r'],\
             data3d['theta'],\
             data3d['V_r'],\
-            data3d['V_theta'] = np.vectorize(
-                transform
-            )(
-                x=data3d[cyl_x],
-                y=data3d[cyl_y],
-                u=data3d[cyl_u],
-                v=data3d[cyl_v],
+            data3d['V_theta'] = get_cyl_flow(
+                x=data3d[cyl_x].to_numpy(),
+                y=data3d[cyl_y].to_numpy(),
+                u=data3d[cyl_u].to_numpy(),
+                v=data3d[cyl_v].to_numpy(),
+                dtype=dtype,
             )
-            t.update()
+
+        if isinstance(self.data_3d, LazyColData):
+            # Applied to every snapshot when it is parsed
+            self.data_3d.add_transform(add_cyl_flow)
+            self._got_processed_3d_cyl_flow_3d = True
+            return
+        t = tqdm(total=self.data_3d.__len__())
+        if workers is None or workers <= 1:
+            for data3d in self.data_3d.values():
+                add_cyl_flow(data3d)
+                t.update()
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(add_cyl_flow, self.data_3d.values()):
+                    t.update()
         t.close()
         self._got_processed_3d_cyl_flow_3d = True
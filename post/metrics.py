@@ -0,0 +1,327 @@
+"""
+Tools to compute combustion metrics of many cases, regions and cycles.
+
+@author: siddhartha.banerjee
+"""
+
+from tool.data import AttrDict as CFDDict
+from tool.data import MetaDataFrame as CFDDataFrame
+import numpy as np
+import pandas as pd
+
+CYCLE_LENGTH = 720.0
+METRIC_FIELDS = CFDDict(
+    {
+        'pressure': 'Pressure',
+        'volume': 'Volume',
+        'hr_rate': 'HR_Rate',
+        'integrated_hr': 'Integrated_HR',
+    }
+)
+
+
+def get_thermo_frames(thermo=None) -> list:
+    """Give (part, data frame) of thermo data, part as in memory_report."""
+    if isinstance(thermo, pd.DataFrame):
+        return [('all', thermo)]
+    frames = []
+    for part, value in thermo.items():
+        if isinstance(value, pd.DataFrame):
+            frames.append((part, value))
+        elif isinstance(value, list):
+            frames += [
+                (part + str(ireg), frame)
+                for ireg, frame in enumerate(value)
+                if isinstance(frame, pd.DataFrame)
+            ]
+    return frames
+
+
+def get_field(
+        frame: pd.DataFrame = None,
+        field_name: str = None,
+) -> np.ndarray:
+    """Give values of a field by header name, or None if missing."""
+    if field_name not in frame.columns.get_level_values(0):
+        return None
+    values = frame[field_name]
+    if values.ndim == 2:
+        values = values.iloc[:, 0]
+    return values.to_numpy(dtype=float)
+
+
+def get_field_unit(
+        frames: list = None,
+        field_name: str = None,
+) -> str:
+    """Give unit of a field from the first frame that has it."""
+    for _, frame in frames:
+        unit = getattr(frame, '_unit', {}).get(field_name)
+        if unit is not None:
+            return unit
+    return None
+
+
+def is_lexsorted(keys: tuple = None) -> bool:
+    """Give if rows are sorted by keys, the first key first."""
+    is_tied = np.ones(max(keys[0].size - 1, 0), dtype=bool)
+    for key in keys:
+        step = np.diff(key)
+        if (step[is_tied] < 0).any():
+            return False
+        is_tied &= step == 0
+    return True
+
+
+def stack_cycles(
+        frames: list = None,
+        fields: dict = None,
+        cycle_length: float = CYCLE_LENGTH,
+        cycle_start: float = None,
+) -> tuple:
+    """Give rows of all frames grouped by part, case and cycle.
+
+    Frames are indexed by crank, or by (case, crank). Cycles of
+    cycle_length are counted from cycle_start, default the first crank of
+    each case and part, and include their last crank.
+    Rows are only sorted if they are not in order already, as they are
+    when loaded. Give the stacked crank and fields, the group of each row,
+    the first row of each group and a data frame of the case, part and
+    cycle of each group, indexed by its rank by case, part and cycle.
+    """
+    columns = CFDDict({'case': [], 'part': [], 'crank': []})
+    values = CFDDict({key: [] for key in fields})
+    levels = []
+    for ipart, (part, frame) in enumerate(frames):
+        crank = frame.index.get_level_values(-1).to_numpy(dtype=float)
+        if frame.index.nlevels > 1:
+            levels.append(frame.index.levels[0])
+            columns.case.append(frame.index.codes[0])
+        else:
+            levels.append(pd.Index([None]))
+            columns.case.append(np.zeros(crank.size, dtype=int))
+        columns.part.append(np.full(crank.size, ipart))
+        columns.crank.append(crank)
+        for key, field_name in fields.items():
+            field = get_field(frame=frame, field_name=field_name)
+            values[key].append(
+                np.full(crank.size, np.nan) if field is None else field
+            )
+    # Case codes of all frames in the same case names
+    case_names = levels[0].append(levels[1:]).unique()
+    case_codes = np.concatenate(
+        [
+            case_names.get_indexer(level)[codes]
+            for level, codes in zip(levels, columns.case)
+        ]
+    )
+    crank = np.concatenate(columns.crank)
+    part = np.concatenate(columns.part)
+    is_valid = ~np.isnan(crank)
+    if cycle_start is None:
+        # First crank of each case and part
+        series = part * case_names.size + case_codes
+        first = np.full(series.max(initial=0) + 1, np.inf)
+        np.minimum.at(first, series[is_valid], crank[is_valid])
+        start = first[series]
+    else:
+        start = cycle_start
+    # A cycle ends at its last crank, so a run of one cycle is one cycle
+    cycle = np.maximum(
+        np.ceil((crank - np.where(is_valid, start, 0)) / cycle_length) - 1,
+        0,
+    )
+    if is_lexsorted((part, case_codes, cycle, crank)):
+        order = slice(None) if is_valid.all() else is_valid
+    else:
+        order = np.lexsort((crank, cycle, case_codes, part))
+        order = order[is_valid[order]]
+    crank = crank[order]
+    case_codes = case_codes[order]
+    part = part[order]
+    cycle = cycle[order].astype(int)
+    is_new = np.ones(crank.size, dtype=bool)
+    is_new[1:] = (np.diff(part) != 0) | (np.diff(case_codes) != 0) \
+        | (np.diff(cycle) != 0)
+    starts = np.flatnonzero(is_new)
+    group = np.cumsum(is_new) - 1
+    stacked = CFDDict(
+        {key: np.concatenate(value)[order] for key, value in values.items()}
+    )
+    keys = pd.DataFrame(
+        {
+            'case': case_names.take(case_codes[starts]),
+            'part': [frames[ipart][0] for ipart in part[starts]],
+            'cycle': cycle[starts],
+        },
+        index=np.argsort(
+            np.lexsort((cycle[starts], part[starts], case_codes[starts]))
+        ),
+    )
+    return crank, stacked, group, starts, keys
+
+
+def reduce_groups(
+        function=np.fmax,
+        values: np.ndarray = None,
+        starts: np.ndarray = None,
+) -> np.ndarray:
+    """Give values reduced by function over rows of each group."""
+    if starts.size == 0:
+        return np.zeros(0, dtype=values.dtype)
+    return function.reduceat(values, starts)
+
+
+def cumulative_trapezoid(
+        x: np.ndarray = None,
+        y: np.ndarray = None,
+        group: np.ndarray = None,
+        starts: np.ndarray = None,
+) -> np.ndarray:
+    """Give integral of y over x from the first row of each group."""
+    if x.size == 0:
+        return np.zeros(0)
+    steps = 0.5 * (y[1:] + y[:-1]) * np.diff(x)
+    steps[group[1:] != group[:-1]] = 0.0
+    integral = np.concatenate([[0.0], np.cumsum(steps)])
+    return integral - integral[starts][group]
+
+
+def crossing_crank(
+        crank: np.ndarray = None,
+        fraction: np.ndarray = None,
+        group: np.ndarray = None,
+        starts: np.ndarray = None,
+        levels: tuple = (0.1, 0.5, 0.9),
+) -> np.ndarray:
+    """Give crank where fraction first reaches each level, by group.
+
+    fraction is made non-decreasing within each group and offset by twice
+    the group number, so one searchsorted finds the crossings of all groups
+    and the crank is linearly interpolated between the rows around it.
+    Groups with NaN fraction give NaN.
+    """
+    ngroup = starts.size
+    if ngroup == 0:
+        return np.zeros([0, levels.__len__()])
+    is_valid = ~np.isnan(fraction)
+    key = np.maximum.accumulate(
+        2.0 * group + np.clip(np.where(is_valid, fraction, 0.0), 0.0, 1.0)
+    )
+    ends = np.append(starts[1:], crank.size) - 1
+    target = 2.0 * np.arange(ngroup)[:, np.newaxis] \
+        + np.clip(np.asarray(levels, dtype=float), 0.0, 1.0)
+    upper = np.searchsorted(key, target.ravel(), side='left').reshape(
+        target.shape
+    )
+    upper = np.clip(upper, starts[:, np.newaxis], ends[:, np.newaxis])
+    lower = np.maximum(upper - 1, starts[:, np.newaxis])
+    dkey = key[upper] - key[lower]
+    weight = np.divide(
+        target - key[lower],
+        dkey,
+        out=np.zeros(target.shape),
+        where=dkey > 0,
+    )
+    crossing = crank[lower] + np.clip(weight, 0.0, 1.0) \
+        * (crank[upper] - crank[lower])
+    has_nan = np.bincount(group[~is_valid], minlength=ngroup) != 0
+    crossing[has_nan] = np.nan
+    return crossing
+
+
+def combustion_metrics(
+        thermo=None,
+        cycle_length: float = CYCLE_LENGTH,
+        cycle_start: float = None,
+        fractions: tuple = (10, 50, 90),
+        fields: dict = None,
+) -> CFDDataFrame:
+    """Give IMEP, peak pressure, its crank and burn angles by cycle.
+
+    thermo is the thermo data of a case or of a CaseBatch, or one of its
+    data frames, indexed by crank or by (case, crank). All cases, parts
+    and cycles are computed at once on the stacked rows. IMEP is the
+    trapezoid integral of pressure over volume divided by the swept volume
+    of the cycle, and CA10, CA50 and CA90 are the cranks where the heat
+    released since the start of the cycle reaches the fractions (in
+    percent) of its maximum, from Integrated_HR or else from the integral
+    of HR_Rate. fields renames the headers of METRIC_FIELDS. Metrics of
+    missing fields are NaN.
+    """
+    fields = CFDDict({**METRIC_FIELDS, **(fields or {})})
+    frames = get_thermo_frames(thermo)
+    assert frames.__len__() != 0, "No thermo data to compute metrics from."
+    crank, values, group, starts, keys = stack_cycles(
+        frames=frames,
+        fields=fields,
+        cycle_length=cycle_length,
+        cycle_start=cycle_start,
+    )
+    ngroup = starts.size
+    pressure = values.pressure
+    volume = values.volume
+    # Indicated work and swept volume of each cycle
+    work = np.zeros(ngroup)
+    if crank.size > 1:
+        steps = 0.5 * (pressure[1:] + pressure[:-1]) * np.diff(volume)
+        steps[group[1:] != group[:-1]] = 0.0
+        work = np.bincount(group[1:], weights=steps, minlength=ngroup)
+    swept = reduce_groups(np.fmax, volume, starts) \
+        - reduce_groups(np.fmin, volume, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        imep = np.where(swept > 0, work / swept, np.nan)
+    # Peak pressure and its first crank
+    peak = reduce_groups(np.fmax, pressure, starts)
+    peak_row = reduce_groups(
+        np.minimum,
+        np.where(pressure == peak[group], np.arange(crank.size), crank.size),
+        starts,
+    )
+    peak_crank = np.append(crank, np.nan)[peak_row]
+    # Burn angles from the heat released since the start of the cycle
+    released = values.integrated_hr
+    if np.isnan(released).all() and not np.isnan(values.hr_rate).all():
+        released = cumulative_trapezoid(
+            x=crank,
+            y=values.hr_rate,
+            group=group,
+            starts=starts,
+        )
+    else:
+        released = released - released[starts][group]
+    total = reduce_groups(np.fmax, released, starts)[group]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(total > 0, released / total, np.nan)
+    burn = crossing_crank(
+        crank=crank,
+        fraction=fraction,
+        group=group,
+        starts=starts,
+        levels=tuple(np.asarray(fractions, dtype=float) / 100.0),
+    )
+    metrics = CFDDataFrame(
+        {
+            'case': keys.case,
+            'part': keys.part,
+            'cycle': keys.cycle,
+            'imep': imep,
+            'peak_pressure': peak,
+            'peak_pressure_crank': peak_crank,
+        },
+        index=keys.index,
+    )
+    for ifrac, frac in enumerate(fractions):
+        metrics['ca' + str(frac)] = burn[:, ifrac]
+    metrics = CFDDataFrame(metrics.sort_index().reset_index(drop=True))
+    if metrics.case.isna().all():
+        metrics = CFDDataFrame(metrics.drop(columns='case'))
+    pressure_unit = get_field_unit(frames=frames, field_name=fields.pressure)
+    crank_unit = get_field_unit(frames=frames, field_name='Crank')
+    metrics._unit = {
+        'imep': pressure_unit,
+        'peak_pressure': pressure_unit,
+        'peak_pressure_crank': crank_unit,
+        **{'ca' + str(frac): crank_unit for frac in fractions},
+    }
+    return metrics
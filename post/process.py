@@ -6,15 +6,39 @@ Tools to process CFD results.
 
 from tool.data import AttrDict as CFDDict
 from tool.data import MetaDataFrame as CFDDataFrame
+from tool.data import EnsembleStatistics
 from tool.plot import get_port_grid_lines as GetGridLine
 from post.import_cfd_results import FileNameFmt as filefmt
 from post.import_cfd_results import organize_cfd_results as cfdread
+from post.import_cfd_results import get_executor
+from post.import_cfd_results import CaseFileIndex
+from post.import_cfd_results import read_echo_file
+from post.cache import ResultCache
+from post.cache import CACHE_DIR
+from post.metrics import combustion_metrics as combmetrics
+from post.metrics import CYCLE_LENGTH
+from post.cycles import CycleIndex
+from tool.stats import LoadStats
+from tool.stats import NO_STATS
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import os
+import threading
+import time
 from matplotlib import pyplot as plt
 import numpy as np
 import pandas as pd
 
 LOADCHAR = r'\|/-'
+FILE_SYSTEMS = (
+    'region_based',
+    'boundary_based',
+    'flow_based',
+    'monitor_point_based',
+    'rank_based',
+    'other_based',
+)
 
 
 class Case:
@@ -28,19 +52,11 @@ class Case:
         """Instantiate the class."""
 
         self.result_dir = proj_dir + os.sep + proj_name
-        self.cyc_freq = self._get_echo_info(
-            file_name='engine.echo',
-            eng_info='rpm',
-        ) / 60.0
+        self.engine = self.get_echo(file_name='engine.echo')
+        self.cyc_freq = self.engine['rpm'] / 60.0
         try:
-            self._version = int(
-                self._get_sim_info(
-                    file_name='engine.echo',
-                    eng_info='version',
-                    info_pos=int(1)
-                ).split(sep='.')[0]
-            )
-        except ValueError:
+            self._version = int(str(self.engine['version']).split(sep='.')[0])
+        except (KeyError, ValueError):
             self._version = int(-1)
         # Version specific regions_flow header specification
         if self._version >= 3:
@@ -58,6 +74,26 @@ class Case:
         self._got_processed = False
         self._appended_with_other = False
         self._appending_index = []
+        self._tails = None
+        self._compact = False
+        self.file_index = None
+        self.stats = NO_STATS
+        self.futures = CFDDict({})
+        self.cycles = None
+        self._selection = CFDDict(
+            {
+                'append_dir': None,
+                'pool': 'thread',
+                'cache': False,
+                'cache_dir': None,
+                'cache_size': 2 ** 30,
+                'follow': False,
+                'categories': None,
+                'columns': {},
+                'regions': {},
+                'crank_range': None,
+            }
+        )
 
         self.file_category = CFDDict(
             {
@@ -94,36 +130,35 @@ class Case:
             }
         )
 
+    def get_echo(
+        self,
+        file_name: str = 'engine.echo',
+    ) -> CFDDict:
+        """Get typed run parameters of an echo file of the case."""
+        return read_echo_file(self.result_dir + os.sep + file_name)
+
     def _get_echo_info(
         self,
         file_name: str = 'engine.echo',
         eng_info: str = 'rpm',
         info_pos: int = 0,
     ):
-        """Get simulation run parameter from the echo file."""
+        """Get simulation run parameter from the echo file.
 
-        line_txt = []
-        with open(
-            self.result_dir + os.sep + file_name, "r"
-        ) as fp:
-            for line in fp:
-                line_txt.append(line)
-        fp.close()
-        param = line_txt[
-            [
-                inum
-                for inum, ltxt in enumerate(line_txt)
-                if eng_info in ltxt
-            ][0]
-        ].split()
-        try:
-            eng_param = float(param[info_pos])
-        except ValueError:
-            eng_param = float(param[info_pos + 1])
-        except:
-            eng_param = None
-
-        return eng_param
+        A parameter not found by key is read from the first line with
+        eng_info, as the word at info_pos or else the word after it.
+        """
+        values = [self.__find_echo(file_name, eng_info)]
+        if values[0] is None:
+            values = self.__scan_echo(file_name, eng_info)[
+                info_pos:info_pos + 2
+            ]
+        for value in values:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+        return None
 
     def _get_sim_info(
         self,
@@ -131,179 +166,754 @@ class Case:
         eng_info: str = 'version',
         info_pos: int = int(1),
     ) -> str:
-        """Get simulation run parameter from the echo file."""
+        """Get simulation run parameter from the echo file.
 
-        line_txt = []
-        with open(
-            self.result_dir + os.sep + file_name, "r"
-        ) as fp:
-            for line in fp:
-                line_txt.append(line)
-        fp.close()
-        try:
-            param = line_txt[
-                [
-                    inum
-                    for inum, ltxt in enumerate(line_txt)
-                    if eng_info in ltxt
-                ][0]
-            ].split()
-        except IndexError:
-            return ''
-        try:
-            eng_param = str(param[info_pos])
-        except:
-            eng_param = ''
+        A parameter not found by key is read from the first line with
+        eng_info, as the word at info_pos.
+        """
+        value = self.__find_echo(file_name, eng_info)
+        if value is not None:
+            return str(value)
+        param = self.__scan_echo(file_name, eng_info)
+        return param[info_pos] if info_pos < param.__len__() else ''
+
+    def __find_echo(
+        self,
+        file_name: str = 'engine.echo',
+        eng_info: str = None,
+    ):
+        """Get first parameter of the echo file with eng_info in its key."""
+        echo = self.get_echo(file_name=file_name)
+        if eng_info in echo:
+            return echo[eng_info]
+        for key, value in echo.items():
+            if eng_info in key:
+                return value
+        return None
 
-        return eng_param
+    def __scan_echo(
+        self,
+        file_name: str = 'engine.echo',
+        eng_info: str = None,
+    ) -> list:
+        """Get words of the first line of the echo file with eng_info."""
+        with open(self.result_dir + os.sep + file_name, 'r') as fp:
+            for line in fp:
+                if eng_info in line:
+                    return line.split()
+        return []
 
     def load_cfd_data(
             self,
             append_dir: str = None,
+            workers: int = None,
+            pool: str = 'thread',
+            cache: bool = False,
+            cache_dir: str = None,
+            cache_size: int = 2 ** 30,
+            follow: bool = False,
+            file_index: CaseFileIndex = None,
+            categories: list = None,
+            columns: dict = None,
+            regions: dict = None,
+            crank_range: tuple = None,
+            compact: bool = False,
+            profile: bool = False,
+            profile_memory: bool = False,
     ) -> None:
-        """Load data from CFD out files."""
-
-        if 'region_based' in self.file_category.keys():
-            for out_type in self.file_category.region_based:
-                try:
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer='Crank',
-                            sorter='Crank',
-                        )
-                    )
-                except (ValueError, KeyError):
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer=('Crank', '(none)'),
-                            sorter=('Crank', '(none)'),
-                        )
-                    )
-                print(' ... Done.')
-            print('====================')
+        """Load data from CFD out files.
 
-        if 'boundary_based' in self.file_category.keys():
-            for out_type in self.file_category.boundary_based:
-                setattr(
-                    self,
-                    list(out_type)[0],
-                    cfdread(
-                        folder_name=self.result_dir,
-                        append_folder_name=append_dir,
-                        file_fmt=out_type[list(out_type)[0]],
-                        indexer='Crank',
-                        sorter='Crank',
+        With workers, categories are loaded concurrently and their files
+        are parsed by a shared thread or process pool. With cache, parsed
+        files are kept in cache_dir (default inside the case directory) and
+        unchanged files are not parsed again on the next load. With follow,
+        the read position of every file is kept for refresh_cfd_data. The
+        case folders are scanned once into file_index, or the given index
+        is used if the folders did not change since it was made.
+
+        Only the file categories named in categories are loaded, e.g.
+        ['thermo', 'time'], and columns and regions give by category the
+        header names, e.g. {'thermo': ['Pressure']}, and the sub-domain IDs
+        to parse, e.g. {'thermo': [0]}. Unlisted categories are loaded
+        with all columns and regions. With crank_range=(start, end), only
+        the rows within the crank window are parsed. With compact, columns
+        are stored as float32 where that keeps their values, see
+        compact_cfd_data. With profile, timings, bytes and rows of every
+        stage, category and file are collected in stats, with peak of
+        traced allocations if profile_memory.
+        """
+
+        options = locals()
+        assert not self.is_loading(), "Data is still loading."
+        out_types, result_cache, file_index, start = self.__start_load(
+            **{
+                key: value for key, value in options.items()
+                if key not in ('self', 'workers', 'compact')
+            }
+        )
+        if workers is None or workers <= 1:
+            loaded = (
+                self._load_out_type(
+                    file_sys=file_sys,
+                    out_type=out_type,
+                    append_dir=append_dir,
+                    cache=result_cache,
+                    tails=self.__get_tails(out_type),
+                    file_index=file_index,
+                    stats=self.stats,
+                )
+                for file_sys, out_type in out_types
+            )
+            self.__set_loaded(out_types=out_types, loaded=loaded)
+        else:
+            with get_executor(workers=workers, pool=pool) as file_pool, \
+                    ThreadPoolExecutor(max_workers=workers) as out_pool:
+                futures = [
+                    out_pool.submit(
+                        self._load_out_type,
+                        file_sys=file_sys,
+                        out_type=out_type,
+                        append_dir=append_dir,
+                        executor=file_pool,
+                        cache=result_cache,
+                        tails=self.__get_tails(out_type),
+                        file_index=file_index,
+                        stats=self.stats,
                     )
+                    for file_sys, out_type in out_types
+                ]
+                self.__set_loaded(
+                    out_types=out_types,
+                    loaded=(future.result() for future in futures),
                 )
-                print(' ... Done.')
-            print('====================')
+        self.__finish_load(compact=compact, start=start)
 
-        if 'flow_based' in self.file_category.keys():
-            for out_type in self.file_category.flow_based:
-                tmp = cfdread(
-                    folder_name=self.result_dir,
-                    append_folder_name=append_dir,
-                    file_fmt=out_type[list(out_type)[0]],
-                    sorter=('Crank', '(none)'),
-                )
-                tmp_modified = CFDDataFrame(
-                    tmp.set_index(keys=('Crank', '(none)'))
+    def load_cfd_data_async(
+            self,
+            workers: int = None,
+            compact: bool = False,
+            **kwargs,
+    ) -> CFDDict:
+        """Load data from CFD out files in the background.
+
+        Give futures by file category right away. Keyword arguments are the
+        other arguments of load_cfd_data. Categories are loaded in the order
+        of file systems, by workers of them at a time, and each is set as
+        attribute as soon as it is loaded, before its future is done. Once
+        all categories are loaded without error, data is marked as loaded.
+        In a notebook, a future can be awaited with asyncio.wrap_future.
+        """
+        assert not self.is_loading(), "Data is still loading."
+        out_types, result_cache, file_index, start = self.__start_load(
+            **kwargs
+        )
+        self._loaded_data = False
+        if workers is None or workers <= 1:
+            workers = 1
+            file_pool = None
+        else:
+            file_pool = get_executor(
+                workers=workers,
+                pool=self._selection.pool,
+            )
+        pending = {list(out_type)[0] for _, out_type in out_types}
+        lock = threading.Lock()
+        failed = []
+
+        def load(file_sys, out_type):
+            file_key = list(out_type)[0]
+            try:
+                data = self._load_out_type(
+                    file_sys=file_sys,
+                    out_type=out_type,
+                    append_dir=self._selection.append_dir,
+                    executor=file_pool,
+                    cache=result_cache,
+                    tails=self.__get_tails(out_type),
+                    file_index=file_index,
+                    stats=self.stats,
                 )
-                tmp_modified._unit = tmp.unit_
-                tmp_modified.index.name = 'Crank'
-                setattr(
-                    self,
-                    list(out_type)[0],
-                    tmp_modified,
+                if compact:
+                    with self.stats.bind(file_key).stage('compact'):
+                        self.__compact_frames(file_key=file_key, value=data)
+                setattr(self, file_key, data)
+                return data
+            except BaseException:
+                failed.append(file_key)
+                raise
+            finally:
+                with lock:
+                    pending.discard(file_key)
+                    is_last = pending.__len__() == 0
+                if is_last:
+                    if file_pool is not None:
+                        file_pool.shutdown(wait=False)
+                    if failed.__len__() == 0:
+                        self.__finish_load(compact=False, start=start)
+                        self._compact = compact
+                    else:
+                        self.stats.stop()
+
+        out_pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = CFDDict(
+            {
+                list(out_type)[0]: out_pool.submit(load, file_sys, out_type)
+                for file_sys, out_type in out_types
+            }
+        )
+        out_pool.shutdown(wait=False)
+        if out_types.__len__() == 0:
+            self.__finish_load(compact=compact, start=start)
+        return self.futures
+
+    def is_loading(self) -> bool:
+        """Give if a background load is still running."""
+        return not all(future.done() for future in self.futures.values())
+
+    def wait_cfd_data(
+            self,
+            categories: list = None,
+            timeout: float = None,
+    ) -> None:
+        """Wait for categories of a background load, or all of them.
+
+        Errors of loading the categories are raised.
+        """
+        for file_key, future in self.futures.items():
+            if categories is None or file_key in categories:
+                future.result(timeout=timeout)
+
+    def __start_load(
+            self,
+            pool: str = 'thread',
+            cache: bool = False,
+            cache_dir: str = None,
+            cache_size: int = 2 ** 30,
+            follow: bool = False,
+            append_dir: str = None,
+            file_index: CaseFileIndex = None,
+            categories: list = None,
+            columns: dict = None,
+            regions: dict = None,
+            crank_range: tuple = None,
+            profile: bool = False,
+            profile_memory: bool = False,
+    ) -> tuple:
+        """Set options, stats, cache, followed files and index of a load.
+
+        See load_cfd_data for the arguments, kept in _selection. Give out
+        types, cache, file index and start time.
+        """
+        self._selection = CFDDict(
+            {
+                'append_dir': append_dir,
+                'pool': pool,
+                'cache': cache,
+                'cache_dir': cache_dir,
+                'cache_size': cache_size,
+                'follow': follow,
+                'categories': categories,
+                'columns': columns or {},
+                'regions': regions or {},
+                'crank_range': crank_range,
+            }
+        )
+        self.stats = LoadStats(enabled=profile, memory=profile_memory)
+        self.stats.start()
+        start = time.perf_counter()
+        out_types = self.__get_out_types()
+        if cache or cache_dir is not None:
+            if cache_dir is None:
+                cache_dir = self.result_dir + os.sep + CACHE_DIR
+            result_cache = ResultCache(
+                cache_dir=cache_dir,
+                max_bytes=cache_size,
+            )
+        else:
+            result_cache = None
+        if follow:
+            assert pool == 'thread', 'follow needs a thread pool.'
+            self._tails = {}
+        else:
+            self._tails = None
+        with self.stats.stage('scan'):
+            if file_index is None or file_index.is_stale():
+                file_index = CaseFileIndex(
+                    folder_names=[self.result_dir, append_dir],
                 )
+        self.file_index = file_index
+        return out_types, result_cache, file_index, start
+
+    def __finish_load(
+            self,
+            compact: bool = False,
+            start: float = None,
+    ) -> None:
+        """Mark data as loaded, compact and index it, record load time."""
+        self._loaded_data = True
+        self._compact = compact
+        if compact:
+            with self.stats.stage('compact'):
+                self.compact_cfd_data()
+        with self.stats.stage('cycles'):
+            self.index_cycles()
+        self.stats.add(
+            stage='load',
+            seconds=time.perf_counter() - start,
+            peak_bytes=self.stats.peak_bytes() if self.stats.enabled
+            else None,
+        )
+        self.stats.stop()
+
+    def __get_out_types(self) -> list:
+        """Give selected file categories in the order of file systems."""
+        categories = self._selection.categories
+        return [
+            (file_sys, out_type)
+            for file_sys in FILE_SYSTEMS
+            if file_sys in self.file_category.keys()
+            for out_type in self.file_category[file_sys]
+            if categories is None or list(out_type)[0] in categories
+        ]
+
+    def __set_loaded(
+            self,
+            out_types: list = None,
+            loaded=None,
+    ) -> None:
+        """Set loaded data as attributes in the order of file systems."""
+        for file_sys in FILE_SYSTEMS:
+            if file_sys not in self.file_category.keys():
+                continue
+            for out_sys, out_type in out_types:
+                if out_sys != file_sys:
+                    continue
+                setattr(self, list(out_type)[0], next(loaded))
                 print(' ... Done.')
             print('====================')
 
-        if 'monitor_point_based' in self.file_category.keys():
-            for out_type in self.file_category.monitor_point_based:
-                setattr(
-                    self,
-                    list(out_type)[0],
-                    cfdread(
-                        folder_name=self.result_dir,
-                        append_folder_name=append_dir,
-                        file_fmt=out_type[list(out_type)[0]],
-                        indexer='Crank',
-                        sorter='Crank',
-                    )
+    def __get_tails(
+            self,
+            out_type: dict = None,
+    ) -> dict:
+        """Give followed files of a file category."""
+        if self._tails is None:
+            return None
+        return self._tails.setdefault(list(out_type)[0], {})
+
+    def _load_out_type(
+            self,
+            file_sys: str = None,
+            out_type: dict = None,
+            append_dir: str = None,
+            executor: Executor = None,
+            cache: ResultCache = None,
+            tails: dict = None,
+            file_index: CaseFileIndex = None,
+            stats: LoadStats = NO_STATS,
+    ):
+        """Load data of one file category."""
+        file_key = list(out_type)[0]
+        stats = stats.bind(file_key)
+        with stats.stage('category'):
+            return self.__read_out_type(
+                file_sys=file_sys,
+                out_type=out_type,
+                append_dir=append_dir,
+                executor=executor,
+                cache=cache,
+                tails=tails,
+                file_index=file_index,
+                stats=stats,
+            )
+
+    def __read_out_type(
+            self,
+            file_sys: str = None,
+            out_type: dict = None,
+            append_dir: str = None,
+            executor: Executor = None,
+            cache: ResultCache = None,
+            tails: dict = None,
+            file_index: CaseFileIndex = None,
+            stats: LoadStats = NO_STATS,
+    ):
+        """Read data of one file category with the indexer fallback."""
+        file_key = list(out_type)[0]
+        file_fmt = out_type[file_key]
+        usecols = self._selection.columns.get(file_key)
+        regions = self._selection.regions.get(file_key)
+        if file_sys == 'flow_based':
+            tmp = cfdread(
+                folder_name=self.result_dir,
+                append_folder_name=append_dir,
+                file_fmt=file_fmt,
+                sorter=('Crank', '(none)'),
+                executor=executor,
+                cache=cache,
+                tails=tails,
+                file_index=file_index,
+                usecols=usecols,
+                regions=regions,
+                crank_range=self._selection.crank_range,
+                stats=stats,
+            )
+            tmp_modified = CFDDataFrame(
+                tmp.set_index(keys=('Crank', '(none)'))
+            )
+            tmp_modified._unit = tmp.unit_
+            tmp_modified.index.name = 'Crank'
+            return tmp_modified
+        # Followed files are read again from the same position on retry
+        tails_retry = copy.deepcopy(tails)
+        try:
+            return cfdread(
+                folder_name=self.result_dir,
+                append_folder_name=append_dir,
+                file_fmt=file_fmt,
+                indexer='Crank',
+                sorter='Crank',
+                executor=executor,
+                cache=cache,
+                tails=tails,
+                file_index=file_index,
+                usecols=usecols,
+                regions=regions,
+                crank_range=self._selection.crank_range,
+                stats=stats,
+            )
+        except (ValueError, KeyError):
+            if file_sys in ('boundary_based', 'monitor_point_based'):
+                raise
+            data = cfdread(
+                folder_name=self.result_dir,
+                append_folder_name=append_dir,
+                file_fmt=file_fmt,
+                indexer=('Crank', '(none)'),
+                sorter=('Crank', '(none)'),
+                executor=executor,
+                cache=cache,
+                tails=tails_retry,
+                file_index=file_index,
+                usecols=usecols,
+                regions=regions,
+                crank_range=self._selection.crank_range,
+                stats=stats,
+            )
+            if tails is not None:
+                tails.clear()
+                tails.update(tails_retry)
+            return data
+
+    def refresh_cfd_data(self) -> None:
+        """Append rows written to the out files since the last refresh.
+
+        Needs data loaded with follow. Only the bytes added to each file are
+        parsed, new restart and region files are picked up, and the rows
+        are appended to the loaded data frames in place. Rows of a crank
+        repeated by a restart are kept, as when loaded. With compact, only
+        the new rows are compacted, and columns stay float32 where both the
+        loaded and the new values fit. Parsing costs the size of the new
+        rows, but appending copies every data frame with new rows, so a
+        refresh also costs the size of these frames.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        assert not self.is_loading(), "Data is still loading."
+        assert self._tails is not None, "Load data with follow=True."
+        self.file_index = CaseFileIndex(
+            folder_names=[self.result_dir, self._selection.append_dir],
+        )
+        appended = []
+        for file_sys, out_type in self.__get_out_types():
+            file_key = list(out_type)[0]
+            new_data = self._load_out_type(
+                file_sys=file_sys,
+                out_type=out_type,
+                append_dir=self._selection.append_dir,
+                tails=self.__get_tails(out_type),
+                file_index=self.file_index,
+                stats=self.stats,
+            )
+            if self._compact:
+                self.__compact_frames(file_key=file_key, value=new_data)
+            setattr(
+                self,
+                file_key,
+                self.__merge_rows(
+                    data=getattr(self, file_key, None),
+                    new_data=new_data,
+                ),
+            )
+            appended += [
+                (file_key, part)
+                for _, part, frame in self.__get_value_frames(
+                    file_key=file_key,
+                    value=new_data,
                 )
-                print(' ... Done.')
-            print('====================')
+                if frame.__len__() != 0
+            ]
+            print(' ... Done.')
+        # Only data frames with appended rows are indexed again
+        for file_key, part in appended:
+            self.cycles.add(
+                file_key=file_key,
+                part=part,
+                frame=self.__get_frame(file_key=file_key, part=part),
+            )
+        if appended.__len__() != 0:
+            self.cycles.build(keys=appended)
 
-        if 'rank_based' in self.file_category.keys():
-            for out_type in self.file_category.rank_based:
-                try:
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer='Crank',
-                            sorter='Crank',
-                        )
-                    )
-                except (ValueError, KeyError):
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer=('Crank', '(none)'),
-                            sorter=('Crank', '(none)'),
-                        )
-                    )
-                print(' ... Done.')
-            print('====================')
+    def __get_frames(self):
+        """Give (category, part, data frame) of the loaded data."""
+        for _, out_type in self.__get_out_types():
+            file_key = list(out_type)[0]
+            value = getattr(self, file_key, None)
+            yield from self.__get_value_frames(file_key=file_key, value=value)
 
-        if 'other_based' in self.file_category.keys():
-            for out_type in self.file_category.other_based:
-                try:
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer='Crank',
-                            sorter='Crank',
-                        )
-                    )
-                except (ValueError, KeyError):
-                    setattr(
-                        self,
-                        list(out_type)[0],
-                        cfdread(
-                            folder_name=self.result_dir,
-                            append_folder_name=append_dir,
-                            file_fmt=out_type[list(out_type)[0]],
-                            indexer=('Crank', '(none)'),
-                            sorter=('Crank', '(none)'),
-                        )
-                    )
-                print(' ... Done.')
-            print('====================')
+    @staticmethod
+    def __get_value_frames(
+            file_key: str = None,
+            value=None,
+    ):
+        """Give (category, part, data frame) of data of one category."""
+        if isinstance(value, pd.DataFrame):
+            yield file_key, 'all', value
+        elif isinstance(value, dict):
+            for part, item in value.items():
+                if isinstance(item, pd.DataFrame):
+                    yield file_key, part, item
+                elif isinstance(item, list):
+                    for ireg, frame in enumerate(item):
+                        if isinstance(frame, pd.DataFrame):
+                            yield file_key, part + str(ireg), frame
 
-        self._loaded_data = True
+    def compact_cfd_data(
+            self,
+            rtol: float = 1e-6,
+            atol: float = 0.0,
+    ) -> None:
+        """Store loaded columns as float32 where that keeps their values.
+
+        A column is downcast only if all its values are within
+        atol + rtol * |value| of their float32 value, and Crank columns
+        stay float64. Data frames are changed in place.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        for _, out_type in self.__get_out_types():
+            file_key = list(out_type)[0]
+            self.__compact_frames(
+                file_key=file_key,
+                value=getattr(self, file_key, None),
+                rtol=rtol,
+                atol=atol,
+            )
+
+    def __compact_frames(
+            self,
+            file_key: str = None,
+            value=None,
+            rtol: float = 1e-6,
+            atol: float = 0.0,
+    ) -> None:
+        """Store columns of data of one category as float32 in place."""
+        for _, _, frame in self.__get_value_frames(
+                file_key=file_key,
+                value=value,
+        ):
+            if isinstance(frame, CFDDataFrame):
+                frame.compact(rtol=rtol, atol=atol, keep=('Crank',))
+
+    def combustion_metrics(
+            self,
+            cycle_length: float = CYCLE_LENGTH,
+            cycle_start: float = None,
+            fractions: tuple = (10, 50, 90),
+            fields: dict = None,
+    ) -> CFDDataFrame:
+        """Give IMEP, peak pressure and burn angles by region and cycle.
+
+        See combustion_metrics of post.metrics for the arguments. Cycles
+        start at the start of the cycle index by default.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        assert hasattr(self, 'thermo'), "Load thermo data first."
+        if cycle_start is None and self.cycles is not None:
+            cycle_start = self.cycles.start
+        return combmetrics(
+            thermo=self.thermo,
+            cycle_length=cycle_length,
+            cycle_start=cycle_start,
+            fractions=fractions,
+            fields=fields,
+        )
+
+    def index_cycles(
+            self,
+            cycle_start: float = None,
+            cycle_length: float = CYCLE_LENGTH,
+    ) -> None:
+        """Index cycles of every loaded crank sorted data frame.
+
+        Cycles of cycle_length start at cycle_start, default the first
+        crank of the loaded data. Done at load, refresh and append.
+        self.cycles.to_frame() gives the crank and time of every cycle,
+        from cyc_freq, and its rows by category and part.
+        """
+        cycles = CycleIndex(
+            start=cycle_start,
+            length=cycle_length,
+            cyc_freq=self.cyc_freq,
+        )
+        for file_key, part, frame in self.__get_frames():
+            cycles.add(file_key=file_key, part=part, frame=frame)
+        cycles.build()
+        self.cycles = cycles
+
+    def __get_frame(
+            self,
+            file_key: str = None,
+            part: str = 'all',
+    ) -> pd.DataFrame:
+        """Give data frame of a category by part, e.g. 'region0'."""
+        frames = {
+            frame_part: frame
+            for _, frame_part, frame in self.__get_value_frames(
+                file_key=file_key,
+                value=getattr(self, file_key, None),
+            )
+        }
+        assert part in frames, "No " + part + " data of " + file_key + "."
+        return frames[part]
+
+    def get_cycle(
+            self,
+            file_key: str = None,
+            cycle: int = 0,
+            part: str = 'all',
+    ) -> CFDDataFrame:
+        """Give rows of one cycle of a category, without copying them.
+
+        Negative cycles count from the last one.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        frame = self.__get_frame(file_key=file_key, part=part)
+        rows = CFDDataFrame(
+            frame.iloc[
+                self.cycles.get_slice(
+                    file_key=file_key,
+                    part=part,
+                    cycle=cycle,
+                )
+            ]
+        )
+        rows._unit = frame.unit_
+        rows._desc = frame.desc_
+        return rows
+
+    def cycle_overlay(
+            self,
+            file_key: str = None,
+            field_names: list = None,
+            part: str = 'all',
+            grid: np.ndarray = None,
+    ) -> CFDDataFrame:
+        """Give fields of all cycles of a category on the cranks of grid.
+
+        Columns are (field, cycle), see overlay of CycleIndex.
+        """
+        assert self._loaded_data, "Data not loaded yet."
+        return self.cycles.overlay(
+            file_key=file_key,
+            part=part,
+            frame=self.__get_frame(file_key=file_key, part=part),
+            field_names=field_names,
+            grid=grid,
+        )
+
+    def phase_average(
+            self,
+            file_key: str = None,
+            field_names: list = None,
+            part: str = 'all',
+            grid: np.ndarray = None,
+            percentiles: tuple = (),
+    ) -> CFDDataFrame:
+        """Give mean, std, min, max of fields across cycles by crank.
+
+        Columns are (field, statistic), see EnsembleStatistics.
+        """
+        return EnsembleStatistics(
+            self.cycle_overlay(
+                file_key=file_key,
+                field_names=field_names,
+                part=part,
+                grid=grid,
+            ),
+            percentiles=percentiles,
+        )
+
+    def memory_report(
+            self,
+            deep: bool = True,
+    ) -> pd.DataFrame:
+        """Give rows, columns and bytes of loaded data by category and part.
+
+        Part is 'all' or the sub-domain, e.g. 'region0'.
+        """
+        report = [
+            {
+                'category': file_key,
+                'part': part,
+                'rows': frame.shape[0],
+                'columns': frame.shape[1],
+                'float32': int((frame.dtypes == np.float32).sum()),
+                'bytes': int(frame.memory_usage(index=True, deep=deep).sum()),
+            }
+            for file_key, part, frame in self.__get_frames()
+        ]
+        return pd.DataFrame(
+            report,
+            columns=[
+                'category', 'part', 'rows', 'columns', 'float32', 'bytes',
+            ],
+        ).set_index(['category', 'part'])
+
+    def __merge_rows(
+            self,
+            data=None,
+            new_data=None,
+    ):
+        """Give data with new rows appended, in place where possible."""
+        if data is None:
+            return new_data
+        if isinstance(new_data, dict):
+            for key, value in new_data.items():
+                data[key] = self.__merge_rows(
+                    data=data.get(key),
+                    new_data=value,
+                )
+            return data
+        if isinstance(new_data, list) and isinstance(data, list):
+            for ireg, value in enumerate(new_data):
+                if ireg < data.__len__():
+                    data[ireg] = self.__merge_rows(
+                        data=data[ireg],
+                        new_data=value,
+                    )
+                else:
+                    data.append(value)
+            return data
+        if not isinstance(new_data, pd.DataFrame) \
+                or new_data.__len__() == 0:
+            return data
+        if not isinstance(data, pd.DataFrame) \
+                or data.columns.__len__() == 0:
+            return new_data
+        # Rows of a repeated crank, as of restarts, are kept as when loaded
+        data.append_with(new_data, overwrite=False)
+        if not data.index.is_monotonic_increasing:
+            data.sort_index(kind='stable', inplace=True)
+        return data
 
     def append_cfd_data(
             self,
@@ -318,6 +928,8 @@ class Case:
         for file_sys in self.file_category:
             for file_type in self.file_category[file_sys]:
                 for file_key in file_type:
+                    if not hasattr(self, file_key):
+                        continue
                     try:
                         try:
                             _unit = self.__getattribute__(
@@ -412,31 +1024,66 @@ class Case:
         print(' \n ... Done ...')
         self._appending_index = np.unique(self._appending_index)
         self._appended_with_other = True
+        self.index_cycles(
+            cycle_start=self.cycles.start,
+            cycle_length=self.cycles.length,
+        )
 
     def __cumulative_sum(
             self,
             x: CFDDataFrame = None,
     ) -> CFDDataFrame:
         """Static method to cumulative sum data."""
-        for idx in self._appending_index:
-            if x.ndim == 2:
-                for name, data in x.iteritems():
-                    d = x[name][x.index == idx].values - \
-                        x[name][x.index > idx].values[0]
-                    a = np.add(data[x.index > idx].values, d)
-                    a = np.append(
-                        data[x.index <= idx].values,
-                        a
-                    )
-                    x.loc[:, [name]] = np.array([a]).T
-            elif x.ndim == 1:
-                d = x[x.index == idx].values - x[x.index > idx].values[0]
-                a = np.add(x[x.index > idx].values, d)
-                a = np.append(
-                    x[x.index <= idx].values,
-                    a
-                )
-                x.loc[:] = (np.array([a]).T).reshape([a.size])
+        return self.stitch_cumulative(x=x)
+
+    def stitch_cumulative(
+            self,
+            x: CFDDataFrame = None,
+            columns: list = None,
+    ) -> CFDDataFrame:
+        """Remove jumps of cumulative data at the appending index.
+
+        Data after each restart is shifted by the jump between the last row
+        before and the first row after it, for all restarts and the given
+        columns (default all) at once. x is corrected in place and returned.
+        """
+        boundaries = np.unique(self._appending_index)
+        if boundaries.size == 0:
+            return x
+        if x.ndim == 1:
+            values = x.to_numpy(dtype=float)[:, np.newaxis]
+        else:
+            if columns is None:
+                columns = list(x.columns)
+            values = x.loc[:, columns].to_numpy(dtype=float)
+        index = x.index.to_numpy()
+        if x.index.is_monotonic_increasing:
+            at = np.searchsorted(index, boundaries, side='right') - 1
+            after = at + 1
+        else:
+            at = np.full(boundaries.size, -1)
+            after = np.full(boundaries.size, index.size)
+            for ibound, idx in enumerate(boundaries):
+                at_idx = np.flatnonzero(index == idx)
+                after_idx = np.flatnonzero(index > idx)
+                if at_idx.size != 0:
+                    at[ibound] = at_idx[-1]
+                if after_idx.size != 0:
+                    after[ibound] = after_idx[np.argmin(index[after_idx])]
+        is_valid = (at >= 0) & (after < index.size)
+        is_valid[is_valid] = index[at[is_valid]] == boundaries[is_valid]
+        jumps = values[at[is_valid]] - values[after[is_valid]]
+        offsets = np.concatenate(
+            [np.zeros([1, values.shape[1]]), np.cumsum(jumps, axis=0)]
+        )
+        restarts = np.searchsorted(boundaries[is_valid], index, side='left')
+        values = values + offsets[restarts]
+        # Values are cast to the dtype of the columns, e.g. float32
+        if x.ndim == 1:
+            x.loc[:] = values[:, 0].astype(x.dtype)
+        else:
+            for icol, column in enumerate(columns):
+                x[column] = values[:, icol].astype(x[column].dtype)
         return x
 
 
@@ -21,6 +21,8 @@ class AttrDict(dict):
 class MetaDataFrame(pd.DataFrame):
     """panda dataframe with metadata"""
 
+    _metadata = ['_unit', '_desc']
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         warnings.filterwarnings(
@@ -39,25 +41,15 @@ class MetaDataFrame(pd.DataFrame):
             verify_integrity=False,
     ) -> MetaDataFrame:
         """Set index for the CFD dataframe."""
-        super().set_index(
-            keys=keys,
-            drop=drop,
-            append=append,
-            inplace=inplace,
-            verify_integrity=verify_integrity,
-        )
-        dataframe = self.copy()
-        dataframe = dataframe.set_index(
+        dataframe = super().set_index(
             keys=keys,
             drop=drop,
             append=append,
             inplace=inplace,
             verify_integrity=verify_integrity,
         )
-        warnings.filterwarnings(
-            action="ignore",
-            category=UserWarning,
-        )
+        if inplace:
+            return None
         setattr(dataframe, 'unit_', self.unit_)
         setattr(dataframe, 'desc_', self.desc_)
         return dataframe
@@ -72,7 +64,7 @@ class MetaDataFrame(pd.DataFrame):
             na_position='last',
     ) -> MetaDataFrame:
         """Sort values using a row"""
-        super().sort_values(
+        dataframe = super().sort_values(
             by=by,
             axis=axis,
             ascending=ascending,
@@ -80,33 +72,108 @@ class MetaDataFrame(pd.DataFrame):
             kind=kind,
             na_position=na_position,
         )
-        dataframe = self.copy()
-        dataframe = dataframe.sort_values(
-            by=by,
-            axis=axis,
-            ascending=ascending,
-            inplace=inplace,
-            kind=kind,
-            na_position=na_position,
-        )
-        warnings.filterwarnings(
-            action="ignore",
-            category=UserWarning,
-        )
+        if inplace:
+            return None
         setattr(dataframe, 'unit_', self.unit_)
         setattr(dataframe, 'desc_', self.desc_)
         return dataframe
 
+    def compact(
+            self,
+            rtol: float = 1e-6,
+            atol: float = 0.0,
+            keep: list = (),
+    ) -> list:
+        """Downcast float64 columns to float32 without changing id().
+
+        Only columns with all values within atol + rtol * |value| of the
+        float32 value are downcast, and they are returned. Columns with
+        header in keep stay float64.
+        """
+        columns = [
+            column for column, dtype in self.dtypes.items()
+            if dtype == np.float64 and (
+                column[0] if isinstance(column, tuple) else column
+            ) not in keep
+        ]
+        if columns.__len__() == 0:
+            return []
+        values = self.loc[:, columns].to_numpy(dtype=np.float64)
+        with np.errstate(over='ignore', invalid='ignore'):
+            downcast = values.astype(np.float32)
+            is_close = (downcast == values) | np.isnan(values) \
+                | (np.abs(downcast - values) <= atol + rtol * np.abs(values))
+        columns = [
+            column for column, is_ok in zip(columns, is_close.all(axis=0))
+            if is_ok
+        ]
+        if columns.__len__() == 0:
+            return []
+        self._update_inplace(
+            pd.DataFrame(self).astype(
+                {column: np.float32 for column in columns}
+            )
+        )
+        return columns
+
     def append_with(
             self,
             df: pd.DataFrame = None,
+            overwrite: bool = True,
     ) -> None:
-        """Appending dataframe to itself without changing id()."""
-        for row in df.iterrows():
-            try:
-                self.loc[row[0]] = row[1]
-            except ValueError:
-                pass
+        """Appending dataframe to itself without changing id().
+
+        Rows with an index already in the frame overwrite it (the last one
+        wins for repeated index) and the others are appended in order of
+        first appearance, all in one operation. Rows with an index that is
+        duplicated in the frame are skipped. Without overwrite, all rows
+        are appended, repeated index included.
+        """
+        if self.columns.__len__() == 0 or df.index.__len__() == 0:
+            return
+        if overwrite:
+            df = self.__overwrite(df)
+        else:
+            df = df.reindex(columns=self.columns)
+        if df.__len__() == 0:
+            return
+        appended = pd.concat(
+            [pd.DataFrame(self), df],
+            axis=0,
+            sort=False,
+        )
+        appended.index.names = self.index.names
+        self._update_inplace(appended)
+
+    def __overwrite(
+            self,
+            df: pd.DataFrame = None,
+    ) -> pd.DataFrame:
+        """Overwrite rows with an index of df, give the other rows of df."""
+        index = df.index
+        if not index.is_unique:
+            df = df[~index.duplicated(keep='last')].reindex(
+                index[~index.duplicated(keep='first')]
+            )
+        df = df.reindex(columns=self.columns)
+        # In a sorted frame only rows from the first new index can be hit
+        first = 0
+        if self.index.nlevels == 1 and self.index.is_monotonic_increasing:
+            first = self.index.searchsorted(df.index.min(), side='left')
+        tail = self.index[first:]
+        target = df.index.get_indexer(tail)
+        is_hit = (target >= 0) & ~tail.duplicated(keep=False)
+        if is_hit.any():
+            # Values are cast to the dtype of the columns, e.g. float32
+            rows = first + np.flatnonzero(is_hit)
+            for dtype in self.dtypes.unique():
+                positions = np.flatnonzero(self.dtypes == dtype)
+                self.iloc[rows, positions] = df.iloc[
+                    target[is_hit], positions
+                ].to_numpy(
+                    dtype=dtype if isinstance(dtype, np.dtype) else None
+                )
+        return df[~df.index.isin(tail)]
 
     @property
     def unit_(self):
@@ -137,3 +204,157 @@ def MergeInterpolate(
         }
     )
     return df
+
+
+def InterpolateColumns(
+        x: np.ndarray = None,
+        values: np.ndarray = None,
+        grid: np.ndarray = None,
+        outside: float = None,
+) -> np.ndarray:
+    """Give all columns of values at x interpolated linearly onto grid.
+
+    The interval of every grid point is found by one searchsorted and used
+    for all columns. x should be increasing. Points outside of x get the
+    first or last value, as with np.interp, or outside if it is given.
+    """
+    x = np.asarray(x, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(x.size, -1)
+    grid = np.asarray(grid, dtype=float)
+    if x.size == 0:
+        return np.full([grid.size, values.shape[1]], np.nan)
+    if x.size == 1:
+        interpolated = np.repeat(values, grid.size, axis=0)
+    else:
+        upper = np.clip(np.searchsorted(x, grid, side='right'), 1, x.size - 1)
+        lower = upper - 1
+        dx = x[upper] - x[lower]
+        weight = np.divide(
+            grid - x[lower],
+            dx,
+            out=np.zeros(grid.size),
+            where=dx != 0,
+        )[:, np.newaxis]
+        interpolated = values[upper]
+        interpolated -= values[lower]
+        interpolated *= weight
+        interpolated += values[lower]
+    is_below = grid <= x[0]
+    is_above = grid >= x[-1]
+    if outside is None:
+        interpolated[is_below] = values[0]
+        interpolated[is_above] = values[-1]
+    else:
+        interpolated[(grid < x[0]) | (grid > x[-1])] = outside
+        interpolated[grid == x[0]] = values[0]
+        interpolated[grid == x[-1]] = values[-1]
+    return interpolated
+
+
+def ResampleInterpolate(
+        dataframes=None,
+        grid: np.ndarray = None,
+        field_names: list = None,
+        outside: float = None,
+) -> MetaDataFrame:
+    """Give fields of many dataframes interpolated onto a common index grid.
+
+    dataframes is a dict of dataframes by case name, a list of them, or one
+    dataframe with the case name as the outer index level. Fields default
+    to the columns common to all and grid to the index of the first case.
+    Columns of the result are (field, case) and units of the fields are
+    kept.
+    """
+    unit = {}
+    if isinstance(dataframes, pd.DataFrame):
+        # Frames split by case are plain data frames without units
+        unit.update(getattr(dataframes, '_unit', {}))
+        dataframes = {
+            name: dataframes.xs(name, level=0)
+            for name in dataframes.index.unique(level=0)
+        }
+    elif not isinstance(dataframes, dict):
+        dataframes = dict(enumerate(dataframes))
+    names = list(dataframes)
+    frames = [dataframes[name] for name in names]
+    if field_names is None:
+        field_names = [
+            column for column in frames[0].columns
+            if all(column in frame.columns for frame in frames[1:])
+        ]
+    if grid is None:
+        grid = frames[0].index.to_numpy(dtype=float)
+    grid = np.asarray(grid, dtype=float)
+    resampled = np.empty([names.__len__(), grid.size, field_names.__len__()])
+    for iname, frame in enumerate(frames):
+        x = frame.index.to_numpy(dtype=float)
+        values = frame.loc[:, field_names].to_numpy(dtype=float)
+        if not frame.index.is_monotonic_increasing:
+            order = np.argsort(x, kind='stable')
+            x = x[order]
+            values = values[order]
+        resampled[iname] = InterpolateColumns(
+            x=x,
+            values=values,
+            grid=grid,
+            outside=outside,
+        )
+        for field_name, field_unit in getattr(frame, '_unit', {}).items():
+            unit.setdefault(field_name, field_unit)
+    df = MetaDataFrame(
+        resampled.transpose(1, 2, 0).reshape(grid.size, -1),
+        index=pd.Index(grid, name=frames[0].index.names[-1]),
+        columns=pd.MultiIndex.from_product(
+            [field_names, names],
+            names=['field', 'case'],
+        ),
+    )
+    df._unit = {
+        field_name: unit[field_name]
+        for field_name in field_names if field_name in unit
+    }
+    return df
+
+
+def EnsembleStatistics(
+        resampled: pd.DataFrame = None,
+        percentiles: tuple = (5, 50, 95),
+) -> MetaDataFrame:
+    """Give mean, std, min, max and percentiles of fields across cases.
+
+    resampled has (field, case) columns as given by ResampleInterpolate.
+    Columns of the result are (field, statistic).
+    """
+    field_names = list(resampled.columns.unique(level=0))
+    names = list(resampled.columns.unique(level=1))
+    values = resampled.reindex(
+        columns=pd.MultiIndex.from_product([field_names, names]),
+    ).to_numpy(dtype=float).reshape(
+        resampled.shape[0], field_names.__len__(), names.__len__()
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        statistics = {
+            'mean': np.nanmean(values, axis=2),
+            'std': np.nanstd(values, axis=2),
+            'min': np.nanmin(values, axis=2),
+            'max': np.nanmax(values, axis=2),
+        }
+        if percentiles.__len__() != 0:
+            for percentile, value in zip(
+                    percentiles,
+                    np.nanpercentile(values, percentiles, axis=2),
+            ):
+                statistics['p' + str(percentile)] = value
+    df = MetaDataFrame(
+        np.stack(list(statistics.values()), axis=2).reshape(
+            resampled.shape[0], -1
+        ),
+        index=resampled.index,
+        columns=pd.MultiIndex.from_product(
+            [field_names, list(statistics)],
+            names=['field', 'statistic'],
+        ),
+    )
+    df._unit = dict(getattr(resampled, '_unit', {}))
+    return df
@@ -0,0 +1,180 @@
+"""
+Tool kit for profiling data loading.
+
+@author: siddhartha.banerjee
+"""
+
+from __future__ import annotations
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STATS_COLUMNS = [
+    'stage',
+    'category',
+    'file',
+    'seconds',
+    'bytes',
+    'rows',
+    'peak_bytes',
+]
+NULL_STAGE = contextlib.nullcontext()
+
+
+def TimedCall(
+        function=None,
+        *args,
+):
+    """Give result of the function called with args and seconds it took."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+class LoadStats:
+    """Timings, bytes and rows of loading stages, by category and file.
+
+    A disabled instance records nothing and its stages are a shared null
+    context, so instrumented code costs next to nothing. Peak memory is
+    the peak of traced allocations with memory, else the peak resident
+    memory of the process.
+    """
+
+    def __init__(
+            self,
+            enabled: bool = True,
+            memory: bool = False,
+    ):
+        """Instantiate the class."""
+        self.enabled = enabled
+        self.memory = memory
+        self.records = []
+        self.category = None
+        self._tracing = False
+
+    def bind(
+            self,
+            category: str = None,
+    ) -> LoadStats:
+        """Give stats recording to the same records with category default."""
+        if not self.enabled:
+            return self
+        bound = LoadStats(enabled=True, memory=self.memory)
+        bound.records = self.records
+        bound.category = category
+        return bound
+
+    def add(
+            self,
+            stage: str = None,
+            seconds: float = 0.0,
+            category: str = None,
+            file: str = None,
+            nbytes: int = None,
+            rows: int = None,
+            peak_bytes: int = None,
+    ) -> None:
+        """Record a stage."""
+        if not self.enabled:
+            return
+        self.records.append(
+            {
+                'stage': stage,
+                'category': category if category is not None
+                else self.category,
+                'file': file,
+                'seconds': seconds,
+                'bytes': nbytes,
+                'rows': rows,
+                'peak_bytes': peak_bytes,
+            }
+        )
+
+    def stage(
+            self,
+            stage: str = None,
+            category: str = None,
+            file: str = None,
+    ):
+        """Give context recording time and peak memory of a stage."""
+        if not self.enabled:
+            return NULL_STAGE
+        return self._stage(stage=stage, category=category, file=file)
+
+    @contextlib.contextmanager
+    def _stage(
+            self,
+            stage: str = None,
+            category: str = None,
+            file: str = None,
+    ):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(
+                stage=stage,
+                seconds=time.perf_counter() - start,
+                category=category,
+                file=file,
+                peak_bytes=self.peak_bytes(),
+            )
+
+    def start(self) -> None:
+        """Start tracing allocations if memory is asked for."""
+        if self.enabled and self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self) -> None:
+        """Stop tracing allocations started by start."""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def peak_bytes(self) -> int:
+        """Give peak memory so far in bytes."""
+        if self.memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1]
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def to_frame(self) -> pd.DataFrame:
+        """Give recorded stages as data frame."""
+        return pd.DataFrame(self.records, columns=STATS_COLUMNS)
+
+    def summary(self) -> pd.DataFrame:
+        """Give seconds, bytes, rows and files by category and stage."""
+        df = self.to_frame()
+        summary = df.groupby(['category', 'stage'], dropna=False).agg(
+            seconds=('seconds', 'sum'),
+            bytes=('bytes', 'sum'),
+            rows=('rows', 'sum'),
+            files=('file', 'count'),
+            peak_bytes=('peak_bytes', 'max'),
+        )
+        return summary
+
+    def to_json(
+            self,
+            file_name: str = None,
+    ) -> str:
+        """Give recorded stages as json, also written to file_name."""
+        text = json.dumps({'records': self.records})
+        if file_name is not None:
+            with open(file_name, 'w') as fp:
+                fp.write(text)
+        return text
+
+
+NO_STATS = LoadStats(enabled=False)